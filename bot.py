@@ -6,38 +6,225 @@ Auto-check runs on a schedule without requiring commands.
 Supports MULTIPLE USERS with isolated JSON storage per user.
 """
 import asyncio
-import concurrent.futures
-import requests
+import collections
 import re
-import json
+import time
+import sys
+import queue
+import logging
+import logging.handlers
 from datetime import datetime, timedelta
 from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
-from telegram.error import TelegramError
-from typing import Dict
+from telegram.error import TelegramError, RetryAfter
+from typing import Dict, Optional
 import config
+from config import CONFIG
 import user_database
+import scraper
+from scraper import IS_TERMUX, get_indian_proxy, api_login_request_otp, api_login_verify_otp
 
-user_check_in_progress = {}
-user_notification_queues: Dict[str, asyncio.Queue] = {}
-user_login_state = {}
-next_check_time = None
-thread_executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
 
-def get_user_queue(user_id: str) -> asyncio.Queue:
-    """Get or create an async notification queue for a user."""
+class NotifiableDeque:
+    """
+    Notification queue backed by collections.deque.
+    append() is safe to call from worker threads; get() wakes on a single asyncio.Event.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._items = collections.deque()
+        self._event = asyncio.Event()
+        self._loop = loop
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, item):
+        """Add an item and wake the consumer."""
+        self._items.append(item)
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def get(self):
+        """Pop the oldest item, waiting until one is available."""
+        while not self._items:
+            await self._event.wait()
+            self._event.clear()
+        return self._items.popleft()
+
+    async def get_or_stop(self, stop_event: asyncio.Event):
+        """Pop the oldest item, or return None once stop_event is set and the queue is drained."""
+        while not self._items:
+            if stop_event.is_set():
+                return None
+            item_ready = asyncio.ensure_future(self._event.wait())
+            stopped = asyncio.ensure_future(stop_event.wait())
+            try:
+                await asyncio.wait({item_ready, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                item_ready.cancel()
+                stopped.cancel()
+            self._event.clear()
+        return self._items.popleft()
+
+
+class RateLimiter:
+    """Async token bucket allowing `rate` sends per `period` seconds."""
+
+    def __init__(self, rate: float, period: float = 1.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = rate
+        self._updated_at = time.monotonic()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated_at) * self.rate / self.period)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+
+user_check_locks: Dict[str, asyncio.Lock] = {}
+queued_user_checks = set()  # users waiting for or running an auto-check slot
+user_notification_queues: Dict[str, NotifiableDeque] = {}
+user_login_state = {}
+LOGIN_STATE_TTL_SECONDS = 3600
+next_check_at = None  # time.monotonic() deadline of the next auto-check
+BOT_LOOP: asyncio.AbstractEventLoop = None  # captured once in post_init
+delivery_semaphore = asyncio.Semaphore(CONFIG.max_delivery_workers)
+log = logging.getLogger("BOT")
+scraper_log = logging.getLogger("SCRAPER")
+
+# All notification sends go through one queue; telegram_sender() hands each chat its own sender
+sender_queue: asyncio.Queue = asyncio.Queue()
+send_limiter = RateLimiter(25, 1.0)
+chat_send_queues: Dict[int, collections.deque] = {}  # pending (text, future) per chat with a live chat_sender
+chat_sender_tasks = set()  # strong references so running chat senders are not garbage collected
+sender_task: Optional[asyncio.Task] = None  # telegram_sender(), started in post_init and cancelled in post_shutdown
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_PIN_RE = re.compile(r'\d{5,6}')
+_PIN_TOKEN_RE = re.compile(r'[^\s,]+')
+_SHEIN_RE = re.compile(r'shein', re.IGNORECASE)
+
+def get_user_queue(user_id: str, loop: asyncio.AbstractEventLoop = None) -> NotifiableDeque:
+    """Get or create a notification queue for a user."""
     if user_id not in user_notification_queues:
-        user_notification_queues[user_id] = asyncio.Queue()
+        user_notification_queues[user_id] = NotifiableDeque(loop or BOT_LOOP or asyncio.get_running_loop())
     return user_notification_queues[user_id]
 
+def get_user_lock(user_id: str) -> asyncio.Lock:
+    """Get or create the lock that serializes checks for a specific user."""
+    return user_check_locks.setdefault(user_id, asyncio.Lock())
+
+def prune_login_state():
+    """Drop pending logins older than LOGIN_STATE_TTL_SECONDS so the dict stays bounded."""
+    cutoff = time.monotonic() - LOGIN_STATE_TTL_SECONDS
+    for stale_user in [uid for uid, state in user_login_state.items() if state.get("started_at", 0) < cutoff]:
+        del user_login_state[stale_user]
+
 def is_user_check_in_progress(user_id: str) -> bool:
     """Check if a check is in progress for a specific user."""
-    return user_check_in_progress.get(user_id, False)
+    return get_user_lock(user_id).locked()
+
+
+
+def queue_message(chat_id: int, text: str) -> asyncio.Future:
+    """Queue a message for the rate-limited sender. The returned future resolves to True once sent."""
+    sent_future = asyncio.get_running_loop().create_future()
+    sender_queue.put_nowait((chat_id, text, sent_future))
+    return sent_future
+
+
+async def safe_send(chat_id: int, text: str) -> bool:
+    """Send a message through the rate-limited sender and wait for the outcome."""
+    return await queue_message(chat_id, text)
+
+
+def format_delivery_messages(deliverables) -> list:
+    """
+    Render (product_url, pincode) pairs as delivery alerts, one block per product.
+    Blocks are packed into as few messages as fit under Telegram's size limit.
+    """
+    pincodes_by_product = collections.defaultdict(list)
+    for product_url, pincode in deliverables:
+        pincodes_by_product[product_url].append(pincode)
+    
+    header = "DELIVERY AVAILABLE!\n\n"
+    messages = []
+    current = header
+    for product_url, pincodes in pincodes_by_product.items():
+        block = f"PINCODES: {', '.join(pincodes)}\nLINK: {product_url}\n\n"
+        if current != header and len(current) + len(block) > TELEGRAM_MESSAGE_LIMIT:
+            messages.append(current.rstrip())
+            current = header
+        current += block
+    if current != header:
+        messages.append(current.rstrip())
+    return messages
+
+
+async def telegram_sender(bot):
+    """Route queued messages to one sender per chat, so a burst for one chat never delays the others."""
+    while True:
+        chat_id, text, sent_future = await sender_queue.get()
+        
+        chat_queue = chat_send_queues.get(chat_id)
+        if chat_queue is None:
+            chat_queue = chat_send_queues[chat_id] = collections.deque()
+            task = asyncio.create_task(chat_sender(bot, chat_id, chat_queue))
+            chat_sender_tasks.add(task)
+            task.add_done_callback(chat_sender_tasks.discard)
+        chat_queue.append((text, sent_future))
+        sender_queue.task_done()
+
+
+async def _send_with_retry(bot, chat_id: int, text: str, chat_limiter: RateLimiter) -> bool:
+    """Send one message under the chat and global limits, waiting out Telegram's retry_after. Returns True if sent."""
+    while True:
+        await chat_limiter.acquire()
+        await send_limiter.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except RetryAfter as e:
+            log.warning("Rate limited by Telegram, retrying in %ss", e.retry_after)
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            log.error("Error sending notification: %s", e)
+            return False
 
-def set_user_check_in_progress(user_id: str, in_progress: bool):
-    """Set the check in progress status for a specific user."""
-    user_check_in_progress[user_id] = in_progress
 
+async def chat_sender(bot, chat_id: int, chat_queue: collections.deque):
+    """Send one chat's messages in order under its own and the global rate limit, then exit once idle."""
+    # Telegram allows roughly one message per second per chat
+    chat_limiter = RateLimiter(1, 1.0)
+    try:
+        while True:
+            while chat_queue:
+                text, sent_future = chat_queue.popleft()
+                # One bad item must never end the sender; later messages for this chat depend on it
+                try:
+                    sent = await _send_with_retry(bot, chat_id, text, chat_limiter)
+                    # The waiting caller may have been cancelled in the meantime
+                    if not sent_future.done():
+                        sent_future.set_result(sent)
+                except Exception as e:
+                    log.error("Sender failed on a message for chat %s: %s", chat_id, e)
+            
+            # Linger one limiter period so a follow-up message still sees this chat's rate;
+            # after that a fresh limiter is equivalent, so no per-chat state outlives the sender
+            await asyncio.sleep(chat_limiter.period)
+            if not chat_queue:
+                break
+    finally:
+        # No await between the empty check and this, so a new message always finds a live sender
+        chat_send_queues.pop(chat_id, None)
 
 
 def is_authorized(update: Update) -> bool:
@@ -72,7 +259,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/settoken - Set SHEIN auth token (for API access)\n"
         "/check - Run a check now\n"
         "/help - Show help\n\n"
-        f"Auto-check runs every {config.CHECK_INTERVAL_MINUTES} minutes."
+        f"Auto-check runs every {CONFIG.check_interval_minutes} minutes."
     )
     
     await update.message.reply_text(welcome_message)
@@ -118,10 +305,10 @@ async def mystatus_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = get_user_id(update)
     
-    urls = user_database.get_user_urls(user_id)
-    pincodes = user_database.get_user_pincodes(user_id)
-    stats = user_database.get_user_stats(user_id)
     data = user_database.load_user_data(user_id)
+    urls = data.get("monitorUrls", [])
+    pincodes = data.get("pincodes", [])
+    stats = user_database.get_user_stats(user_id)
     last_check = data.get("lastCheckedTimestamp")
     
     if urls:
@@ -130,17 +317,20 @@ async def mystatus_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         url_list = "  Not configured"
     
     pincodes_str = ', '.join(pincodes) if pincodes else "None configured"
-    last_check_str = last_check if last_check else "Never"
+    if isinstance(last_check, (int, float)):
+        last_check_str = datetime.fromtimestamp(last_check).strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        last_check_str = last_check if last_check else "Never"
     
-    global next_check_time
-    if next_check_time:
+    if next_check_at:
+        next_check_time = datetime.now() + timedelta(seconds=max(0.0, next_check_at - time.monotonic()))
         next_check_str = next_check_time.strftime('%Y-%m-%d %H:%M:%S')
     else:
-        next_check_str = f"Every {config.CHECK_INTERVAL_MINUTES} minutes"
+        next_check_str = f"Every {CONFIG.check_interval_minutes} minutes"
     
     status_text = (
         f"Your Configuration (User: {user_id})\n\n"
-        f"Check Interval: {config.CHECK_INTERVAL_MINUTES} minutes\n"
+        f"Check Interval: {CONFIG.check_interval_minutes} minutes\n"
         f"Pincodes ({len(pincodes)}): {pincodes_str}\n\n"
         f"URLs ({len(urls)}):\n{url_list}\n\n"
         "Statistics:\n"
@@ -185,7 +375,7 @@ async def seturl_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("URL must start with https://")
         return
     
-    if 'shein' not in url.lower():
+    if not _SHEIN_RE.search(url):
         await update.message.reply_text("This doesn't look like a SHEIN URL.")
         return
     
@@ -232,7 +422,7 @@ async def rmurl_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         await query.answer()
-        print(f"[BOT] rmurl_callback triggered: {query.data}")
+        log.debug("rmurl_callback triggered: %s", query.data)
         
         user_id = str(query.from_user.id)
         
@@ -253,14 +443,14 @@ async def rmurl_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if removed:
                     removed_short = removed[:60] + "..." if len(removed) > 60 else removed
                     await query.edit_message_text(f"Removed URL:\n{removed_short}")
-                    print(f"[BOT] Removed URL for user {user_id}: {removed_short}")
+                    log.info("Removed URL for user %s: %s", user_id, removed_short)
                 else:
                     await query.edit_message_text("URL not found or already removed.")
             except (ValueError, IndexError) as e:
-                print(f"[BOT] Error in rmurl_callback: {e}")
+                log.error("Error in rmurl_callback: %s", e)
                 await query.edit_message_text("Error removing URL.")
     except Exception as e:
-        print(f"[BOT] rmurl_callback exception: {e}")
+        log.error("rmurl_callback exception: %s", e)
         try:
             await query.edit_message_text(f"Error: {str(e)[:50]}")
         except:
@@ -284,16 +474,9 @@ async def setpin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    valid_pincodes = []
-    invalid_pincodes = []
-    
-    for arg in context.args:
-        for p in arg.replace(',', ' ').split():
-            p = p.strip()
-            if p.isdigit() and 5 <= len(p) <= 6:
-                valid_pincodes.append(p)
-            elif p:
-                invalid_pincodes.append(p)
+    tokens = _PIN_TOKEN_RE.findall(' '.join(context.args))
+    valid_pincodes = [p for p in tokens if _PIN_RE.fullmatch(p)]
+    invalid_pincodes = [p for p in tokens if not _PIN_RE.fullmatch(p)]
     
     if invalid_pincodes:
         await update.message.reply_text(
@@ -331,12 +514,7 @@ async def rmpin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    pincodes_to_remove = []
-    for arg in context.args:
-        for p in arg.replace(',', ' ').split():
-            p = p.strip()
-            if p:
-                pincodes_to_remove.append(p)
+    pincodes_to_remove = _PIN_TOKEN_RE.findall(' '.join(context.args))
     
     removed = user_database.remove_user_pincodes(user_id, pincodes_to_remove)
     
@@ -426,6 +604,7 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = get_user_id(update)
     global user_login_state
+    prune_login_state()
     
     if not context.args:
         await update.message.reply_text(
@@ -445,11 +624,10 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"Requesting OTP for {phone_number}...")
     
     try:
-        from scraper import api_login_request_otp
         result = api_login_request_otp(phone_number)
         
         if result.get("success"):
-            user_login_state[user_id] = {"phone": phone_number, "waiting_otp": True}
+            user_login_state[user_id] = {"phone": phone_number, "waiting_otp": True, "started_at": time.monotonic()}
             await update.message.reply_text(
                 f"OTP sent to {phone_number}!\n\n"
                 "Enter the OTP code using:\n"
@@ -470,6 +648,7 @@ async def otp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = get_user_id(update)
     global user_login_state
+    prune_login_state()
     
     if not context.args:
         await update.message.reply_text(
@@ -500,16 +679,15 @@ async def otp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Verifying OTP...")
     
     try:
-        from scraper import api_login_verify_otp
         result = api_login_verify_otp(phone_number, otp_code)
         
         if result.get("success"):
-            user_login_state[user_id] = {"phone": phone_number, "waiting_otp": False, "logged_in": True}
+            user_login_state.pop(user_id, None)
             
             cookies = result.get("cookies", "")
             if cookies:
                 user_database.set_auth_cookies(user_id, cookies)
-                print(f"[LOGIN] Saved auth cookies for user {user_id}")
+                log.info("Saved auth cookies for user %s", user_id)
             
             await update.message.reply_text(
                 "Login successful!\n\n"
@@ -518,7 +696,7 @@ async def otp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             error = result.get("error", "Unknown error")
             await update.message.reply_text(f"OTP verification failed: {error}\n\nTry again with /login <phone>")
-            user_login_state[user_id] = {}
+            user_login_state.pop(user_id, None)
     except Exception as e:
         await update.message.reply_text(f"Error: {str(e)}")
 
@@ -573,21 +751,10 @@ async def resend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(f"Sending {len(deliverables)} pending notifications...")
     
-    sent = 0
-    for product_url, pincode in deliverables:
-        try:
-            message = (
-                "DELIVERY AVAILABLE!\n\n"
-                f"PINCODE: {pincode}\n"
-                f"LINK: {product_url}"
-            )
-            await context.bot.send_message(chat_id=chat_id, text=message)
-            sent += 1
-            await asyncio.sleep(0.3)
-        except Exception as e:
-            print(f"[BOT] Error sending notification: {e}")
+    sent_futures = [queue_message(chat_id, message) for message in format_delivery_messages(deliverables)]
     
-    await update.message.reply_text(f"Sent {sent} notifications!")
+    results = await asyncio.gather(*sent_futures)
+    await update.message.reply_text(f"Sent {sum(results)} messages!")
 
 
 async def clearseen_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -597,10 +764,7 @@ async def clearseen_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = get_user_id(update)
     
-    data = user_database.load_user_data(user_id)
-    old_count = len(data.get("seenProducts", []))
-    data["seenProducts"] = []
-    user_database.save_user_data(user_id, data)
+    old_count = user_database.clear_seen_products(user_id)
     
     await update.message.reply_text(
         f"Cleared {old_count} seen products.\n\n"
@@ -610,30 +774,41 @@ async def clearseen_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def auto_check_job(context: ContextTypes.DEFAULT_TYPE):
     """Job callback for automatic scheduled checks - processes ALL users."""
-    global next_check_time
+    global next_check_at
     
-    next_check_time = datetime.now() + timedelta(minutes=config.CHECK_INTERVAL_MINUTES)
+    next_check_at = time.monotonic() + CONFIG.check_interval_minutes * 60
     
     # Run checks as background task to avoid blocking message handlers
     asyncio.create_task(run_all_user_checks(context))
 
 
 async def run_all_user_checks(context: ContextTypes.DEFAULT_TYPE):
-    """Run checks for all users sequentially in background."""
-    for user_id in user_database.get_all_authorized_users():
+    """Run checks for all users concurrently in background, bounded by a semaphore."""
+    semaphore = asyncio.Semaphore(CONFIG.max_concurrent_user_checks)
+    
+    async def check_user(user_id: str):
         try:
-            await run_check_for_user(user_id, int(user_id), context, silent_if_empty=True)
-            # Yield control to allow message handlers to run
-            await asyncio.sleep(0.1)
+            async with semaphore:
+                await run_check_for_user(user_id, int(user_id), context, silent_if_empty=True)
         except Exception as e:
-            print(f"[BOT] Error checking user {user_id}: {e}")
+            log.error("Error checking user %s: %s", user_id, e)
+        finally:
+            queued_user_checks.discard(user_id)
+    
+    # A slow cycle can overlap the next one; users still queued or running are left to finish
+    user_ids = [
+        user_id for user_id in user_database.get_all_authorized_users()
+        if user_id not in queued_user_checks and not is_user_check_in_progress(user_id)
+    ]
+    queued_user_checks.update(user_ids)
+    
+    await asyncio.gather(*(check_user(user_id) for user_id in user_ids), return_exceptions=True)
 
 
-def create_user_callback(user_id: str, loop: asyncio.AbstractEventLoop):
-    """Create a user-specific callback for new product notifications."""
+def create_user_callback(user_id: str):
+    """Create a user-specific callback for new product notifications (safe to call from worker threads)."""
     def callback(product_url: str):
-        user_queue = get_user_queue(user_id)
-        loop.call_soon_threadsafe(user_queue.put_nowait, product_url)
+        get_user_queue(user_id, BOT_LOOP).append(product_url)
     return callback
 
 
@@ -641,32 +816,31 @@ async def process_notification_queue(bot, chat_id: int, user_id: str, stop_event
     """Process the notification queue and send instant messages for a specific user."""
     user_queue = get_user_queue(user_id)
     
-    while not stop_event.is_set():
+    while True:
+        product_url = await user_queue.get_or_stop(stop_event)
+        if product_url is None:
+            break
+        
         try:
-            product_url = await asyncio.wait_for(user_queue.get(), timeout=0.3)
-            
             message = (
                 "NEW PRODUCT FOUND!\n\n"
                 f"LINK: {product_url}\n\n"
                 "Checking delivery availability..."
             )
-            await bot.send_message(chat_id=chat_id, text=message)
-            print(f"[BOT] Sent instant notification for new product")
-            
-        except asyncio.TimeoutError:
-            await asyncio.sleep(0.1)
-            continue
+            queue_message(chat_id, message)
+            log.debug("Queued instant notification for new product")
         except Exception as e:
-            print(f"[BOT] Error sending instant notification: {e}")
+            log.error("Error sending instant notification: %s", e)
+    
+    # Queues are recreated on demand, so drop this one once the check is over
+    user_notification_queues.pop(user_id, None)
 
 
-def run_scraper_inline(user_id: str, notification_queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+async def run_scraper_async(user_id: str, notification_queue: NotifiableDeque):
     """
-    Run scraper inline with real-time notifications.
-    Called from thread pool - sends notifications immediately as products are found.
+    Run scraper on the event loop, queueing delivery alerts for send_check_notifications().
+    Blocking HTTP calls are pushed to worker threads; URLs, products and pincodes are checked concurrently.
     """
-    import scraper
-    
     urls = user_database.get_user_urls(user_id)
     pincodes = user_database.get_user_pincodes(user_id)
     user_cookies = user_database.get_auth_cookies(user_id)
@@ -674,32 +848,41 @@ def run_scraper_inline(user_id: str, notification_queue: asyncio.Queue, loop: as
     if not urls:
         return {"status": "no_urls", "new_products": 0, "deliverable": 0}
     
-    print(f"[SCRAPER] Starting check for user {user_id}")
-    print(f"[SCRAPER] URLs: {len(urls)} configured")
-    print(f"[SCRAPER] Pincodes: {', '.join(pincodes) if pincodes else 'None'}")
+    scraper_log.info("Starting check for user %s", user_id)
+    scraper_log.info("URLs: %d configured", len(urls))
+    scraper_log.info("Pincodes: %s", ', '.join(pincodes) if pincodes else 'None')
     
     if user_cookies:
-        print(f"[SCRAPER] Using user's auth cookies")
+        scraper_log.info("Using user's auth cookies")
     
     scraper_instance = scraper.get_scraper()
-    total_new = 0
-    total_deliverable = 0
     
-    from scraper import IS_TERMUX, get_indian_proxy
     can_check_availability = IS_TERMUX or get_indian_proxy() is not None
     
-    for url_index, filtered_url in enumerate(urls):
-        print(f"[SCRAPER] Processing URL {url_index + 1}/{len(urls)}")
+    seen_set = user_database.get_seen_products(user_id)
+    known_deliveries = user_database.get_delivery_keys(user_id)
+    
+    async def fetch_and_process_url(url_index: int, filtered_url: str):
+        """Fetch one URL and check its new products. Returns (new, deliverable) counts."""
+        scraper_log.info("Processing URL %d/%d", url_index + 1, len(urls))
+        
+        new_count = 0
+        deliverable_count = 0
+        
+        # Disk writes are batched per URL; delivery alerts are queued and sent packed when the check ends
+        newly_seen = []
+        deliverable_results = []
         
         try:
-            products_data = scraper_instance.fetch_products_api(filtered_url, user_cookies)
+            products_data = await scraper_instance.fetch_all_products(filtered_url, user_cookies, CONFIG.max_products, delivery_semaphore)
             
             if not products_data:
-                print(f"[SCRAPER] No products found from this URL")
-                continue
+                scraper_log.info("No products found from this URL")
+                return new_count, deliverable_count
             
-            print(f"[SCRAPER] API returned {len(products_data)} products")
+            scraper_log.info("API returned %d products", len(products_data))
             
+            new_products = []
             for product in products_data:
                 product_url = product.get('url', f"https://www.sheinindia.in/p/{product.get('code', '')}")
                 product_code = product.get('code', '')
@@ -707,188 +890,237 @@ def run_scraper_inline(user_id: str, notification_queue: asyncio.Queue, loop: as
                 if not product_code:
                     continue
                 
-                if user_database.is_product_seen(user_id, product_url):
+                if product_url in seen_set:
                     continue
                 
-                total_new += 1
-                print(f"[SCRAPER] NEW: {product_url}")
-                
-                is_available = None
-                if can_check_availability and user_cookies:
-                    is_available = scraper_instance.check_availability_via_cart(product_code, user_cookies)
-                
+                seen_set.add(product_url)
+                new_count += 1
+                scraper_log.debug("NEW: %s", product_url)
+                new_products.append((product_url, product_code))
+            
+            if not new_products:
+                return new_count, deliverable_count
+            
+            # Cart checks for every new product go out together, then one delivery batch for all pairs
+            if can_check_availability and user_cookies:
+                availability = await scraper_instance.check_carts_batch(
+                    [product_code for _, product_code in new_products], user_cookies, delivery_semaphore
+                )
+            else:
+                availability = [None] * len(new_products)
+            
+            to_check = []
+            for (product_url, product_code), is_available in zip(new_products, availability):
                 if is_available is False:
-                    print(f"[SCRAPER] Product {product_code} NOT available - skipping")
-                    user_database.mark_product_seen(user_id, product_url)
-                    continue
-                
+                    scraper_log.debug("Product %s NOT available - skipping", product_code)
+                    newly_seen.append(product_url)
+                else:
+                    to_check.append((product_url, product_code))
+            
+            pairs = [(product_code, pincode) for _, product_code in to_check for pincode in pincodes]
+            delivery_results = iter(await scraper_instance.check_deliveries_batch(pairs, user_cookies, delivery_semaphore))
+            
+            for product_url, product_code in to_check:
+                new_pincodes = []
                 for pincode in pincodes:
-                    is_deliverable = scraper_instance.check_delivery_via_api(product_code, pincode, user_cookies)
-                    
+                    is_deliverable = next(delivery_results)
                     if is_deliverable:
-                        is_new = user_database.save_delivery_result(user_id, product_url, pincode)
-                        if is_new:
-                            total_deliverable += 1
-                            print(f"[SCRAPER] DELIVERABLE: {product_url} -> {pincode}")
-                            
-                            notification = {
-                                "type": "delivery",
-                                "product_url": product_url,
-                                "pincode": pincode
-                            }
-                            loop.call_soon_threadsafe(notification_queue.put_nowait, notification)
+                        deliverable_results.append((product_url, pincode))
+                        
+                        if (product_url, pincode) not in known_deliveries:
+                            known_deliveries.add((product_url, pincode))
+                            new_pincodes.append(pincode)
+                            scraper_log.info("DELIVERABLE: %s -> %s", product_url, pincode)
                     else:
-                        print(f"[SCRAPER] NOT deliverable: {product_url} -> {pincode}")
+                        scraper_log.debug("NOT deliverable: %s -> %s", product_url, pincode)
+                
+                # One alert per product, listing every pincode it delivers to
+                if new_pincodes:
+                    deliverable_count += len(new_pincodes)
+                    notification_queue.append({
+                        "type": "delivery",
+                        "product_url": product_url,
+                        "pincodes": new_pincodes
+                    })
                 
-                user_database.mark_product_seen(user_id, product_url)
+                newly_seen.append(product_url)
                 
         except Exception as e:
-            print(f"[SCRAPER] Error processing URL: {e}")
-            continue
+            scraper_log.error("Error processing URL: %s", e)
+        finally:
+            user_database.bulk_save_delivery_results(user_id, deliverable_results)
+            user_database.bulk_mark_products_seen(user_id, newly_seen)
+        
+        return new_count, deliverable_count
+    
+    # URLs are independent network-bound work, so fetch them concurrently
+    results = await asyncio.gather(
+        *(fetch_and_process_url(url_index, filtered_url) for url_index, filtered_url in enumerate(urls))
+    )
+    
+    total_new = sum(new_count for new_count, _ in results)
+    total_deliverable = sum(deliverable_count for _, deliverable_count in results)
     
     return {"status": "ok", "new_products": total_new, "deliverable": total_deliverable}
 
 
-async def send_notifications_realtime(bot, chat_id: int, notification_queue: asyncio.Queue, stop_event: asyncio.Event):
-    """Send notifications in real-time as they arrive in the queue."""
-    while not stop_event.is_set():
-        try:
-            notification = await asyncio.wait_for(notification_queue.get(), timeout=0.3)
-            
-            if notification.get("type") == "delivery":
-                message = (
-                    "DELIVERY AVAILABLE!\n\n"
-                    f"PINCODE: {notification['pincode']}\n"
-                    f"LINK: {notification['product_url']}"
-                )
-                await bot.send_message(chat_id=chat_id, text=message)
-                print(f"[BOT] Sent instant notification for {notification['product_url']}")
-                
-        except asyncio.TimeoutError:
-            continue
-        except asyncio.CancelledError:
+async def send_check_notifications(bot, chat_id: int, notification_queue: NotifiableDeque, stop_event: asyncio.Event):
+    """
+    Collect every delivery alert queued during a check, then send them packed into
+    as few messages as fit under Telegram's size limit once the check stops.
+    """
+    deliverables = []
+    while True:
+        notification = await notification_queue.get_or_stop(stop_event)
+        if notification is None:
             break
-        except Exception as e:
-            print(f"[BOT] Error sending notification: {e}")
+        if notification.get("type") == "delivery":
+            product_url = notification['product_url']
+            deliverables.extend((product_url, pincode) for pincode in notification['pincodes'])
+    
+    try:
+        for message in format_delivery_messages(deliverables):
+            queue_message(chat_id, message)
+        if deliverables:
+            log.debug("Queued %d delivery alerts for chat %s", len(deliverables), chat_id)
+    except Exception as e:
+        log.error("Error sending notification: %s", e)
 
 
 async def run_check_for_user(user_id: str, chat_id: int, context: ContextTypes.DEFAULT_TYPE, silent_if_empty: bool = False):
     """
     Run a product check for a specific user with their isolated data.
-    Sends notifications INSTANTLY as products are found.
+    Delivery alerts found during the check are sent together, packed, when it ends.
     """
-    if is_user_check_in_progress(user_id):
+    user_lock = get_user_lock(user_id)
+    if user_lock.locked():
         return
     
-    set_user_check_in_progress(user_id, True)
-    bot = context.bot if context else Bot(token=config.TELEGRAM_BOT_TOKEN)
-    
-    notification_queue = asyncio.Queue()
-    stop_event = asyncio.Event()
-    loop = asyncio.get_event_loop()
-    
-    notification_task = asyncio.create_task(
-        send_notifications_realtime(bot, chat_id, notification_queue, stop_event)
-    )
-    
-    try:
-        print(f"\n{'='*50}")
-        print(f"[BOT] Check started for user {user_id} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"{'='*50}")
+    async with user_lock:
+        bot = context.bot if context else Bot(token=CONFIG.telegram_bot_token)
         
-        result = await loop.run_in_executor(
-            thread_executor,
-            run_scraper_inline,
-            user_id,
-            notification_queue,
-            loop
-        )
+        stop_event = asyncio.Event()
+        notification_queue = NotifiableDeque(BOT_LOOP or asyncio.get_running_loop())
         
-        await asyncio.sleep(0.5)
-        stop_event.set()
+        notification_task = asyncio.create_task(
+            send_check_notifications(bot, chat_id, notification_queue, stop_event)
+        )
         
         try:
-            await asyncio.wait_for(notification_task, timeout=1.0)
-        except (asyncio.TimeoutError, asyncio.CancelledError):
-            notification_task.cancel()
-        
-        new_count = result.get('new_products', 0)
-        deliverable_count = result.get('deliverable', 0)
-        
-        print(f"[BOT] Check complete: {new_count} new, {deliverable_count} deliverable")
-        
-        if deliverable_count == 0 and not silent_if_empty:
-            stats = user_database.get_user_stats(user_id)
-            await bot.send_message(
-                chat_id=chat_id, 
-                text=(
+            log.info("Check started for user %s", user_id)
+            
+            result = await run_scraper_async(user_id, notification_queue)
+            
+            # The sender drains whatever is still queued before it exits
+            stop_event.set()
+            
+            try:
+                await asyncio.wait_for(notification_task, timeout=1.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                notification_task.cancel()
+            
+            new_count = result.get('new_products', 0)
+            deliverable_count = result.get('deliverable', 0)
+            
+            log.info("Check complete: %d new, %d deliverable", new_count, deliverable_count)
+            
+            if deliverable_count == 0 and not silent_if_empty:
+                stats = user_database.get_user_stats(user_id)
+                await safe_send(
+                    chat_id,
                     "Check Complete\n\n"
                     f"Products seen: {stats['seen_products']}\n"
                     f"Deliveries found: {stats['total_deliveries']}\n"
                     "No new matches this time."
                 )
-            )
-        
-        user_database.cleanup_user_old_entries(user_id)
-        user_database.update_user_last_check(user_id)
-        
-        stats = user_database.get_user_stats(user_id)
-        print(f"[BOT] User {user_id} Stats: {stats}")
-        
-    except Exception as e:
-        print(f"[BOT] Error during check for user {user_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        if not silent_if_empty:
+            
+            user_database.update_user_last_check(user_id)
+            
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("User %s Stats: %s", user_id, user_database.get_user_stats(user_id))
+            
+        except Exception as e:
+            log.exception("Error during check for user %s: %s", user_id, e)
+            if not silent_if_empty:
+                await safe_send(chat_id, f"Error during check: {str(e)[:100]}")
+        finally:
+            stop_event.set()
             try:
-                await bot.send_message(chat_id=chat_id, text=f"Error during check: {str(e)[:100]}")
+                notification_task.cancel()
             except Exception:
                 pass
-    finally:
-        stop_event.set()
-        try:
-            notification_task.cancel()
-        except Exception:
-            pass
-        set_user_check_in_progress(user_id, False)
+    
+    # Locks are recreated on demand; drop idle ones so the dict does not grow forever
+    if not user_lock.locked():
+        user_check_locks.pop(user_id, None)
 
 
 async def post_init(application: Application):
     """Called after the application is initialized."""
-    global next_check_time
+    global next_check_at, BOT_LOOP, sender_task
     
+    BOT_LOOP = asyncio.get_running_loop()
     job_queue = application.job_queue
     
-    next_check_time = datetime.now() + timedelta(seconds=30)
+    # Started directly: the Application isn't running yet, so it wouldn't track this task
+    sender_task = asyncio.create_task(telegram_sender(application.bot))
+    
+    # Load every user's data now so the first auto-check does not hit the disk cold
+    for user_id, data in user_database.warm_cache().items():
+        urls = data.get("monitorUrls", [])
+        pincodes_count = len(data.get("pincodes", []))
+        log.info("User %s: URLs=%d, Pincodes=%d", user_id, len(urls), pincodes_count)
+    
+    next_check_at = time.monotonic() + 30
     
     job_queue.run_repeating(
         auto_check_job,
-        interval=config.CHECK_INTERVAL_MINUTES * 60,
+        interval=CONFIG.check_interval_minutes * 60,
         first=30,
         name='auto_check'
     )
     
-    print(f"[BOT] Auto-check scheduled every {config.CHECK_INTERVAL_MINUTES} minutes")
-    print(f"[BOT] First check in 30 seconds")
-    print(f"[BOT] Authorized users: {', '.join(user_database.get_all_authorized_users())}")
+    log.info("Auto-check scheduled every %d minutes", CONFIG.check_interval_minutes)
+    log.info("First check in 30 seconds")
+    log.info("Authorized users: %s", ', '.join(user_database.get_all_authorized_users()))
+
+
+async def post_shutdown(application: Application):
+    """Stop the notification senders started in post_init."""
+    tasks = [task for task in (sender_task, *chat_sender_tasks) if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Route all logs through a QueueHandler so the event loop never blocks on stdout.
+    A background QueueListener does the actual writing.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+    
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(CONFIG.log_level)
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
 
 
 def main():
     """Main entry point."""
-    print("\n" + "="*60)
-    print("   SHEIN VERSE PRODUCT MONITOR (MULTI-USER)")
-    print("="*60)
-    print(f"  Check Interval: {config.CHECK_INTERVAL_MINUTES} minutes")
-    print(f"  Authorized Users: {', '.join(user_database.get_all_authorized_users())}")
-    print("="*60 + "\n")
-    
-    for user_id in user_database.get_all_authorized_users():
-        data = user_database.load_user_data(user_id)
-        urls = data.get("monitorUrls", [])
-        pincodes_count = len(data.get("pincodes", []))
-        print(f"[DB] User {user_id}: URLs={len(urls)}, Pincodes={pincodes_count}")
+    log_listener = setup_logging()
+    config.log_config()
+    
+    log.info("SHEIN VERSE PRODUCT MONITOR (MULTI-USER)")
+    log.info("Check Interval: %d minutes", CONFIG.check_interval_minutes)
+    log.info("Authorized Users: %s", ', '.join(user_database.get_all_authorized_users()))
     
-    app = Application.builder().token(config.TELEGRAM_BOT_TOKEN).concurrent_updates(True).post_init(post_init).build()
+    app = Application.builder().token(CONFIG.telegram_bot_token).concurrent_updates(True).post_init(post_init).post_shutdown(post_shutdown).build()
     
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
@@ -901,7 +1133,7 @@ def main():
     
     async def debug_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        print(f"[BOT] Unknown callback received: {query.data}")
+        log.warning("Unknown callback received: %s", query.data)
         await query.answer("Unknown action")
     app.add_handler(CallbackQueryHandler(debug_callback))
     app.add_handler(CommandHandler("setpin", setpin_command))
@@ -914,10 +1146,12 @@ def main():
     app.add_handler(CommandHandler("resend", resend_command))
     app.add_handler(CommandHandler("clearseen", clearseen_command))
     
-    print("[BOT] Bot started! Waiting for commands...")
-    print("[BOT] Auto-check will run automatically on schedule")
+    log.info("Bot started! Waiting for commands...")
+    log.info("Auto-check will run automatically on schedule")
     
     app.run_polling(drop_pending_updates=True)
+    user_database.flush_all()
+    log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -7,78 +7,119 @@ No empty or undefined values.
 """
 
 import os
+import logging
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Tuple
+
+log = logging.getLogger("CONFIG")
 
 # --------------------------------------------------
 # Load .env file
 # --------------------------------------------------
+# Logging is not configured yet at import time, so the outcome is reported by log_config()
+_DOTENV_STATUS = None
 try:
     from dotenv import load_dotenv
     env_path = Path(".") / ".env"
     if env_path.exists():
         load_dotenv(dotenv_path=env_path)
-        print("[CONFIG] Loaded .env file")
+        _DOTENV_STATUS = "Loaded .env file"
 except ImportError:
-    print("[CONFIG] python-dotenv not installed")
-
-# --------------------------------------------------
-# TELEGRAM CONFIGURATION
-# --------------------------------------------------
-
-TELEGRAM_BOT_TOKEN = os.environ.get(
-    "TELEGRAM_BOT_TOKEN",
-    "7201368733:AAG3Yp-E5g-DExLHEN-ETrv74zeqwuTIhNM"
-)
-
-if ":" not in TELEGRAM_BOT_TOKEN:
-    raise RuntimeError("Invalid TELEGRAM_BOT_TOKEN")
-
-# Allowed users (comma separated)
-TELEGRAM_CHAT_IDS = os.environ.get(
-    "TELEGRAM_CHAT_IDS",
-    "7194175926,1950577113"
-).split(",")
-
-TELEGRAM_CHAT_IDS = [cid.strip() for cid in TELEGRAM_CHAT_IDS]
-
-# --------------------------------------------------
-# SCRAPER CONFIGURATION
-# --------------------------------------------------
-
-MAX_PRODUCTS = int(os.environ.get("MAX_PRODUCTS", "90"))
-CACHE_EXPIRY_MINUTES = int(os.environ.get("CACHE_EXPIRY_MINUTES", "10"))
-CHECK_INTERVAL_MINUTES = int(os.environ.get("CHECK_INTERVAL_MINUTES", "1"))
-
-# --------------------------------------------------
-# HUMAN-LIKE DELAYS
-# --------------------------------------------------
-
-DEFAULT_WAIT_MIN = float(os.environ.get("DEFAULT_WAIT_MIN", "1.5"))
-DEFAULT_WAIT_MAX = float(os.environ.get("DEFAULT_WAIT_MAX", "3.0"))
-
-# --------------------------------------------------
-# DATABASE CONFIGURATION
-# --------------------------------------------------
-
-DATABASE_PATH = os.environ.get(
-    "DATABASE_PATH",
-    "./shein_monitor.db"
-)
-
-# --------------------------------------------------
-# LOGGING
-# --------------------------------------------------
-
-LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    _DOTENV_STATUS = "python-dotenv not installed"
+
+@dataclass(frozen=True)
+class Config:
+    """All settings, parsed from the environment once at import. Read them via CONFIG."""
+    
+    # --------------------------------------------------
+    # TELEGRAM CONFIGURATION
+    # --------------------------------------------------
+    telegram_bot_token: str
+    # Allowed users (comma separated in the environment)
+    telegram_chat_ids: Tuple[str, ...]
+    
+    # --------------------------------------------------
+    # SCRAPER CONFIGURATION
+    # --------------------------------------------------
+    max_products: int
+    cache_expiry_minutes: int
+    check_interval_minutes: int
+    # How long SHEIN API responses are reused before asking again
+    product_cache_seconds: int
+    delivery_cache_seconds: int
+    # Maximum delivery (pincode) checks in flight at once
+    max_delivery_workers: int
+    # Maximum users checked at the same time by the scheduled job
+    max_concurrent_user_checks: int
+    
+    # --------------------------------------------------
+    # PROXIES
+    # --------------------------------------------------
+    # Indian proxy IP:PORT for cart/delivery APIs ("" if unset)
+    indian_proxy: str
+    proxy_username: str
+    proxy_password: str
+    
+    # --------------------------------------------------
+    # HUMAN-LIKE DELAYS
+    # --------------------------------------------------
+    default_wait_min: float
+    default_wait_max: float
+    
+    # --------------------------------------------------
+    # DATABASE / LOGGING
+    # --------------------------------------------------
+    database_path: str
+    log_level: str
+
+
+def _load_config() -> Config:
+    """Parse every setting from the environment, applying the defaults."""
+    token = os.environ.get(
+        "TELEGRAM_BOT_TOKEN",
+        "7201368733:AAG3Yp-E5g-DExLHEN-ETrv74zeqwuTIhNM"
+    )
+    if ":" not in token:
+        raise RuntimeError("Invalid TELEGRAM_BOT_TOKEN")
+    
+    chat_ids = os.environ.get("TELEGRAM_CHAT_IDS", "7194175926,1950577113").split(",")
+    
+    return Config(
+        telegram_bot_token=token,
+        telegram_chat_ids=tuple(cid.strip() for cid in chat_ids),
+        max_products=int(os.environ.get("MAX_PRODUCTS", "90")),
+        cache_expiry_minutes=int(os.environ.get("CACHE_EXPIRY_MINUTES", "10")),
+        check_interval_minutes=int(os.environ.get("CHECK_INTERVAL_MINUTES", "1")),
+        product_cache_seconds=int(os.environ.get("PRODUCT_CACHE_SECONDS", "60")),
+        delivery_cache_seconds=int(os.environ.get("DELIVERY_CACHE_SECONDS", "300")),
+        max_delivery_workers=int(os.environ.get("MAX_DELIVERY_WORKERS", "8")),
+        max_concurrent_user_checks=int(os.environ.get("MAX_CONCURRENT_USER_CHECKS", "3")),
+        indian_proxy=os.environ.get("INDIAN_PROXY", ""),
+        proxy_username=os.environ.get("PROXY_USERNAME", ""),
+        proxy_password=os.environ.get("PROXY_PASSWORD", ""),
+        default_wait_min=float(os.environ.get("DEFAULT_WAIT_MIN", "1.5")),
+        default_wait_max=float(os.environ.get("DEFAULT_WAIT_MAX", "3.0")),
+        database_path=os.environ.get("DATABASE_PATH", "./shein_monitor.db"),
+        log_level=os.environ.get("LOG_LEVEL", "INFO"),
+    )
+
+
+CONFIG = _load_config()
 
 # --------------------------------------------------
-# FINAL SAFETY LOG
+# STARTUP SUMMARY
 # --------------------------------------------------
 
-print("[CONFIG] Token loaded ✔")
-print("[CONFIG] Allowed users:", TELEGRAM_CHAT_IDS)
-print("[CONFIG] Max products:", MAX_PRODUCTS)
-print("[CONFIG] Check interval:", CHECK_INTERVAL_MINUTES, "minute(s)")
-print("[CONFIG] Cache expiry:", CACHE_EXPIRY_MINUTES, "minutes")
-print("[CONFIG] Database:", DATABASE_PATH)
-print("[CONFIG] Log level:", LOG_LEVEL)
+def log_config() -> None:
+    """Log the loaded configuration. Called once by the bot at startup, not on import."""
+    if _DOTENV_STATUS:
+        log.info(_DOTENV_STATUS)
+    log.info("Token loaded ✔")
+    log.info("Allowed users: %s", list(CONFIG.telegram_chat_ids))
+    log.info("Max products: %d", CONFIG.max_products)
+    log.info("Check interval: %d minute(s)", CONFIG.check_interval_minutes)
+    log.info("Cache expiry: %d minutes", CONFIG.cache_expiry_minutes)
+    log.info("Indian proxy: %s", CONFIG.indian_proxy or "not set")
+    log.info("Database: %s", CONFIG.database_path)
+    log.info("Log level: %s", CONFIG.log_level)
@@ -4,23 +4,85 @@ SQLite Database Module for SHEIN Verse Product Monitor.
 Handles storage of delivery results, seen products tracking,
 pincodes management, and settings persistence.
 """
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Tuple, Optional
-import config
+from typing import Dict, List, Tuple, Optional
+from config import CONFIG
+
+
+log = logging.getLogger("DB")
+
+_CONN: Optional[sqlite3.Connection] = None
+_WRITE_LOCK = threading.Lock()
+
+# Settings change rarely, so reads are served from memory; set_setting keeps this current
+_SETTINGS_CACHE: Dict[str, Optional[str]] = {}
+
+# Hot-path SQL lives in constants so every call hits the connection's statement cache
+_SQL_INSERT_DELIVERY = (
+    "INSERT OR IGNORE INTO deliveries (product_url, pincode, source_url, last_checked, notified) VALUES (?, ?, ?, ?, 0)"
+)
+_SQL_TOUCH_DELIVERY = "UPDATE deliveries SET last_checked = ? WHERE product_url = ? AND pincode = ? AND source_url = ?"
+_SQL_IS_RECENT = (
+    "SELECT 1 FROM deliveries WHERE product_url = ? AND pincode = ? AND source_url = ? AND last_checked > ?"
+)
+_SQL_MARK_SEEN = "INSERT OR IGNORE INTO seen_products (product_url, source_url, first_seen) VALUES (?, ?, ?)"
+_SQL_IS_SEEN = "SELECT 1 FROM seen_products WHERE product_url = ? AND source_url = ?"
+
+
+def _timestamp(moment: Optional[datetime] = None) -> str:
+    """
+    Format a time the way it is stored: 'YYYY-MM-DD HH:MM:SS'.
+    Binding plain strings skips sqlite3's datetime adapter, and the format still sorts correctly.
+    """
+    return (moment or datetime.now()).isoformat(sep=' ', timespec='seconds')
 
 
 def get_connection() -> sqlite3.Connection:
-    """Get a database connection."""
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Get the shared database connection, opening it on first use.
+    The connection is in autocommit mode; multi-statement writes use explicit BEGIN/COMMIT.
+    """
+    global _CONN
+    
+    if _CONN is None:
+        conn = sqlite3.connect(
+            CONFIG.database_path, check_same_thread=False, isolation_level=None, cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _CONN = conn
+    
+    return _CONN
+
+
+@contextmanager
+def _transaction(begin: str = "BEGIN"):
+    """Run a group of writes atomically on the shared connection."""
+    with _WRITE_LOCK:
+        cursor = get_connection().cursor()
+        cursor.execute(begin)
+        try:
+            yield cursor
+        except BaseException:
+            # Also on KeyboardInterrupt/CancelledError, or the shared connection stays mid-transaction
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
 
 
 def init_db() -> None:
     """Initialize the database with required tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
     # Table to track deliverable products
     cursor.execute("""
@@ -72,9 +134,10 @@ def init_db() -> None:
         ON deliveries(last_checked)
     """)
     
-    conn.commit()
-    conn.close()
-    print("[DB] Database initialized successfully")
+    # Give the planner statistics for the indexes up front
+    cursor.execute("ANALYZE")
+    
+    log.info("Database initialized successfully")
 
 
 # ============================================================
@@ -86,23 +149,27 @@ def add_pincodes(pincodes: List[str]) -> List[str]:
     Add one or more pincodes to the database.
     Returns list of successfully added pincodes (ignores duplicates).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    added = []
+    # dict.fromkeys keeps input order while dropping repeats
+    candidates = list(dict.fromkeys(pincodes))
+    if not candidates:
+        return []
+    
+    now = _timestamp()
+    try:
+        with _transaction() as cursor:
+            placeholders = ','.join('?' * len(candidates))
+            cursor.execute(f"SELECT pincode FROM pincodes WHERE pincode IN ({placeholders})", candidates)
+            existing = {row['pincode'] for row in cursor.fetchall()}
+            
+            added = [pincode for pincode in candidates if pincode not in existing]
+            cursor.executemany(
+                "INSERT OR IGNORE INTO pincodes (pincode, added_at) VALUES (?, ?)",
+                [(pincode, now) for pincode in added]
+            )
+    except Exception as e:
+        log.error("Error adding pincodes: %s", e)
+        return []
     
-    for pincode in pincodes:
-        try:
-            cursor.execute("""
-                INSERT OR IGNORE INTO pincodes (pincode, added_at)
-                VALUES (?, ?)
-            """, (pincode, datetime.now()))
-            if cursor.rowcount > 0:
-                added.append(pincode)
-        except Exception as e:
-            print(f"[DB] Error adding pincode {pincode}: {e}")
-    
-    conn.commit()
-    conn.close()
     return added
 
 
@@ -111,22 +178,19 @@ def remove_pincodes(pincodes: List[str]) -> List[str]:
     Remove one or more pincodes from the database.
     Returns list of removed pincodes (ignores non-existing).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
     removed = []
     
-    for pincode in pincodes:
-        try:
-            cursor.execute("""
-                DELETE FROM pincodes WHERE pincode = ?
-            """, (pincode,))
-            if cursor.rowcount > 0:
-                removed.append(pincode)
-        except Exception as e:
-            print(f"[DB] Error removing pincode {pincode}: {e}")
-    
-    conn.commit()
-    conn.close()
+    with _transaction() as cursor:
+        for pincode in pincodes:
+            try:
+                cursor.execute("""
+                    DELETE FROM pincodes WHERE pincode = ?
+                """, (pincode,))
+                if cursor.rowcount > 0:
+                    removed.append(pincode)
+            except Exception as e:
+                log.error("Error removing pincode %s: %s", pincode, e)
+    
     return removed
 
 
@@ -142,9 +206,7 @@ def get_pincodes() -> List[str]:
         SELECT pincode FROM pincodes ORDER BY pincode ASC
     """)
     
-    pincodes = [row['pincode'] for row in cursor.fetchall()]
-    conn.close()
-    return pincodes
+    return [row['pincode'] for row in cursor.fetchall()]
 
 
 def get_pincode_count() -> int:
@@ -153,38 +215,36 @@ def get_pincode_count() -> int:
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) as count FROM pincodes")
-    count = cursor.fetchone()['count']
-    conn.close()
-    return count
+    return cursor.fetchone()['count']
 
 
 # ============================================================
 # SETTINGS MANAGEMENT FUNCTIONS
 # ============================================================
 
-def set_setting(key: str, value: str) -> bool:
+def set_setting(key: str, value: str, now: Optional[str] = None) -> bool:
     """
     Set a setting value in the database.
-    Creates or updates the setting.
+    Creates or updates the setting. Pass now to share one timestamp across several writes.
     """
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            INSERT INTO settings (key, value, updated_at)
-            VALUES (?, ?, ?)
-            ON CONFLICT(key) DO UPDATE SET
-                value = excluded.value,
-                updated_at = excluded.updated_at
-        """, (key, value, datetime.now()))
-        conn.commit()
+        with _WRITE_LOCK:
+            cursor.execute("""
+                INSERT INTO settings (key, value, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = excluded.updated_at
+            """, (key, value, now or _timestamp()))
+        _SETTINGS_CACHE[key] = value
         return True
     except Exception as e:
-        print(f"[DB] Error setting {key}: {e}")
+        log.error("Error setting %s: %s", key, e)
+        invalidate_setting(key)
         return False
-    finally:
-        conn.close()
 
 
 def get_setting(key: str, default: str = None) -> Optional[str]:
@@ -192,19 +252,27 @@ def get_setting(key: str, default: str = None) -> Optional[str]:
     Get a setting value from the database.
     Returns default if not found.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT value FROM settings WHERE key = ?
-    """, (key,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    if key not in _SETTINGS_CACHE:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT value FROM settings WHERE key = ?
+        """, (key,))
+        
+        row = cursor.fetchone()
+        _SETTINGS_CACHE[key] = row['value'] if row else None
     
-    if row:
-        return row['value']
-    return default
+    value = _SETTINGS_CACHE[key]
+    return value if value is not None else default
+
+
+def invalidate_setting(key: str = None) -> None:
+    """Drop one cached setting, or all of them when no key is given."""
+    if key is None:
+        _SETTINGS_CACHE.clear()
+    else:
+        _SETTINGS_CACHE.pop(key, None)
 
 
 def get_filtered_url() -> Optional[str]:
@@ -244,7 +312,7 @@ def get_last_check_time() -> Optional[str]:
 
 def set_last_check_time() -> bool:
     """Update the last check time to now."""
-    return set_setting('LAST_CHECK_TIME', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    return set_setting('LAST_CHECK_TIME', _timestamp())
 
 
 # ============================================================
@@ -255,43 +323,23 @@ def save_result(product_url: str, pincode: str, source_url: str) -> bool:
     """
     Save a deliverable result to the database.
     Returns True if this is a NEW entry (should notify), False if it already exists.
-    Uses explicit check to avoid SQLite UPSERT ambiguity.
+    INSERT OR IGNORE reports newness through rowcount, which an UPSERT cannot.
     """
     conn = get_connection()
-    cursor = conn.cursor()
+    now = _timestamp()
     
     try:
-        # First check if this combination already exists
-        cursor.execute("""
-            SELECT id, notified FROM deliveries 
-            WHERE product_url = ? AND pincode = ? AND source_url = ?
-        """, (product_url, pincode, source_url))
-        
-        existing = cursor.fetchone()
-        
-        if existing is None:
-            # New entry - insert with notified=0
-            cursor.execute("""
-                INSERT INTO deliveries (product_url, pincode, source_url, last_checked, notified)
-                VALUES (?, ?, ?, ?, 0)
-            """, (product_url, pincode, source_url, datetime.now()))
-            conn.commit()
-            print(f"[DB] New deliverable saved: {pincode}")
-            return True  # This is new, should notify
-        else:
+        with _WRITE_LOCK:
+            if conn.execute(_SQL_INSERT_DELIVERY, (product_url, pincode, source_url, now)).rowcount > 0:
+                log.debug("New deliverable saved: %s", pincode)
+                return True  # This is new, should notify
+            
             # Already exists - just update timestamp, don't change notified flag
-            cursor.execute("""
-                UPDATE deliveries SET last_checked = ?
-                WHERE product_url = ? AND pincode = ? AND source_url = ?
-            """, (datetime.now(), product_url, pincode, source_url))
-            conn.commit()
+            conn.execute(_SQL_TOUCH_DELIVERY, (now, product_url, pincode, source_url))
             return False  # Already notified before
-            
     except Exception as e:
-        print(f"[DB] Error saving result: {e}")
+        log.error("Error saving result: %s", e)
         return False
-    finally:
-        conn.close()
 
 
 def is_recent(product_url: str, pincode: str, source_url: str) -> bool:
@@ -299,52 +347,37 @@ def is_recent(product_url: str, pincode: str, source_url: str) -> bool:
     Check if this product/pincode combination was recently checked.
     Returns True if checked within CACHE_EXPIRY_MINUTES.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    expiry_time = datetime.now() - timedelta(minutes=config.CACHE_EXPIRY_MINUTES)
+    expiry_time = _timestamp(datetime.now() - timedelta(minutes=CONFIG.cache_expiry_minutes))
     
-    cursor.execute("""
-        SELECT 1 FROM deliveries 
-        WHERE product_url = ? AND pincode = ? AND source_url = ? 
-        AND last_checked > ?
-    """, (product_url, pincode, source_url, expiry_time))
-    
-    result = cursor.fetchone() is not None
-    conn.close()
-    return result
+    row = get_connection().execute(_SQL_IS_RECENT, (product_url, pincode, source_url, expiry_time)).fetchone()
+    return row is not None
 
 
 def mark_seen(product_url: str, source_url: str) -> None:
     """Mark a product as seen (processed)."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    try:
+        with _WRITE_LOCK:
+            get_connection().execute(_SQL_MARK_SEEN, (product_url, source_url, _timestamp()))
+    except Exception as e:
+        log.error("Error marking seen: %s", e)
+
+
+def mark_seen_many(product_urls: List[str], source_url: str) -> None:
+    """Mark several products as seen in a single transaction."""
+    if not product_urls:
+        return
     
+    now = _timestamp()
     try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO seen_products (product_url, source_url, first_seen)
-            VALUES (?, ?, ?)
-        """, (product_url, source_url, datetime.now()))
-        conn.commit()
+        with _transaction() as cursor:
+            cursor.executemany(_SQL_MARK_SEEN, [(product_url, source_url, now) for product_url in product_urls])
     except Exception as e:
-        print(f"[DB] Error marking seen: {e}")
-    finally:
-        conn.close()
+        log.error("Error marking seen: %s", e)
 
 
 def is_seen(product_url: str, source_url: str) -> bool:
     """Check if a product has already been seen/processed."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 1 FROM seen_products 
-        WHERE product_url = ? AND source_url = ?
-    """, (product_url, source_url))
-    
-    result = cursor.fetchone() is not None
-    conn.close()
-    return result
+    return get_connection().execute(_SQL_IS_SEEN, (product_url, source_url)).fetchone() is not None
 
 
 def get_new_deliverables() -> List[Tuple[str, str]]:
@@ -353,30 +386,17 @@ def get_new_deliverables() -> List[Tuple[str, str]]:
     Returns list of (product_url, pincode) tuples.
     Marks them as notified after retrieval.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, product_url, pincode FROM deliveries 
-        WHERE notified = 0
-        ORDER BY last_checked DESC
-    """)
-    
-    results = cursor.fetchall()
-    deliverables = [(row['product_url'], row['pincode']) for row in results]
-    
-    # Mark all as notified
-    if results:
-        ids = [row['id'] for row in results]
-        placeholders = ','.join('?' * len(ids))
-        cursor.execute(f"""
-            UPDATE deliveries SET notified = 1 
-            WHERE id IN ({placeholders})
-        """, ids)
-        conn.commit()
+    # Claim and read the rows in one statement (needs SQLite 3.35+ for RETURNING)
+    with _WRITE_LOCK:
+        rows = get_connection().execute("""
+            UPDATE deliveries SET notified = 1
+            WHERE notified = 0
+            RETURNING product_url, pincode, last_checked
+        """).fetchall()
     
-    conn.close()
-    return deliverables
+    # RETURNING has no defined order, so restore newest-first here
+    rows.sort(key=lambda row: row['last_checked'], reverse=True)
+    return [(row['product_url'], row['pincode']) for row in rows]
 
 
 def cleanup_old_entries(days: int = 7) -> int:
@@ -384,29 +404,28 @@ def cleanup_old_entries(days: int = 7) -> int:
     Remove entries older than specified days.
     Returns the number of entries removed.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cutoff_time = datetime.now() - timedelta(days=days)
-    
-    # Clean up old deliveries
-    cursor.execute("""
-        DELETE FROM deliveries WHERE last_checked < ?
-    """, (cutoff_time,))
-    deliveries_deleted = cursor.rowcount
+    cutoff_time = _timestamp(datetime.now() - timedelta(days=days))
     
-    # Clean up old seen products
-    cursor.execute("""
-        DELETE FROM seen_products WHERE first_seen < ?
-    """, (cutoff_time,))
-    seen_deleted = cursor.rowcount
+    # IMMEDIATE takes the write lock up front instead of upgrading mid-transaction
+    with _transaction("BEGIN IMMEDIATE") as cursor:
+        # Clean up old deliveries
+        cursor.execute("""
+            DELETE FROM deliveries WHERE last_checked < ?
+        """, (cutoff_time,))
+        deliveries_deleted = cursor.rowcount
+        
+        # Clean up old seen products
+        cursor.execute("""
+            DELETE FROM seen_products WHERE first_seen < ?
+        """, (cutoff_time,))
+        seen_deleted = cursor.rowcount
     
-    conn.commit()
-    conn.close()
+    # Cheap incremental ANALYZE so lookups keep using the right indexes as tables grow
+    get_connection().execute("PRAGMA optimize")
     
     total_deleted = deliveries_deleted + seen_deleted
     if total_deleted > 0:
-        print(f"[DB] Cleaned up {total_deleted} old entries")
+        log.info("Cleaned up %d old entries", total_deleted)
     
     return total_deleted
 
@@ -428,8 +447,6 @@ def get_stats() -> dict:
     cursor.execute("SELECT COUNT(*) as count FROM pincodes")
     pincode_count = cursor.fetchone()['count']
     
-    conn.close()
-    
     return {
         'seen_products': seen_count,
         'total_deliveries': delivery_count,
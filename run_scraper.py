@@ -1,122 +1,154 @@
 #!/usr/bin/env python3
 """
-Subprocess script to run scraper for a user.
-Called from bot.py to run product checks.
+Standalone check runner for a single user.
+run_user_check() runs in-process and returns its result as a dict;
+running this file directly prints that dict as JSON.
 API-only, no browser automation.
 """
 import sys
 import json
+import asyncio
+import logging
+from config import CONFIG
 import scraper
 import user_database
+from scraper import IS_TERMUX, get_indian_proxy
 
+# Upper bound on simultaneous HTTP calls across all of a user's URLs
+MAX_PARALLEL_URLS = 5
 
-def main():
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "No user_id provided"}))
-        sys.exit(1)
-    
-    user_id = sys.argv[1]
-    
+log = logging.getLogger("SCRAPER")
+
+
+async def run_user_check(user_id: str) -> dict:
+    """Check every URL a user monitors and record new deliverables. Returns a result dict."""
     urls = user_database.get_user_urls(user_id)
     pincodes = user_database.get_user_pincodes(user_id)
     
     if not urls:
-        print(json.dumps({"status": "no_urls", "new_products": 0}))
-        sys.exit(0)
+        return {"status": "no_urls", "new_products": 0}
     
-    print(f"[SCRAPER] Starting check for user {user_id}", file=sys.stderr)
-    print(f"[SCRAPER] URLs: {len(urls)} configured", file=sys.stderr)
-    print(f"[SCRAPER] Pincodes: {', '.join(pincodes) if pincodes else 'None'}", file=sys.stderr)
+    log.info("Starting check for user %s", user_id)
+    log.info("URLs: %d configured", len(urls))
+    log.info("Pincodes: %s", ', '.join(pincodes) if pincodes else 'None')
     
-    total_deliverable = 0
     new_products_found = []
+    newly_seen = []
+    pending_deliveries = []
+    cart_confirmed = set()
     user_cookies = user_database.get_auth_cookies(user_id)
     
     if user_cookies:
-        print(f"[SCRAPER] Using user's auth cookies for API calls", file=sys.stderr)
+        log.info("Using user's auth cookies for API calls")
     
     try:
         scraper_instance = scraper.get_scraper()
     except Exception as e:
-        print(f"[SCRAPER] Error getting scraper: {e}", file=sys.stderr)
-        print(json.dumps({"error": str(e)}))
-        sys.exit(1)
+        log.error("Error getting scraper: %s", e)
+        return {"error": str(e)}
+    
+    # Check if we can use cart-based availability check (Termux or Indian proxy)
+    can_check_cart = IS_TERMUX or get_indian_proxy() is not None
+    
+    # URLs may overlap, so products already picked up by another URL are skipped
+    claimed = set()
+    url_semaphore = asyncio.Semaphore(MAX_PARALLEL_URLS)
+    
+    async def process_product(product_url: str):
+        log.debug("New product: %s", product_url)
+        
+        product_id = scraper_instance.extract_product_id(product_url)
+        if not product_id:
+            newly_seen.append(product_url)
+            return
+        
+        # Check availability via cart if on Termux or have Indian proxy
+        is_available = None
+        if can_check_cart and user_cookies:
+            log.debug("Checking cart availability for %s...", product_id)
+            async with url_semaphore:
+                is_available = await asyncio.to_thread(
+                    scraper_instance.check_availability_via_cart, product_id, user_cookies
+                )
+        
+        # Only notify if available (or if we can't check, notify all)
+        # Deliveries are staged here and saved in one go after the loop
+        if is_available is True or is_available is None:
+            if is_available is True:
+                cart_confirmed.add(product_url)
+            for pincode in pincodes:
+                pending_deliveries.append((product_url, pincode))
+        elif is_available is False:
+            log.debug("Product %s NOT available - skipping", product_id)
+        
+        newly_seen.append(product_url)
     
-    for url_index, filtered_url in enumerate(urls):
-        print(f"[SCRAPER] Processing URL {url_index + 1}/{len(urls)}: {filtered_url[:60]}...", file=sys.stderr)
+    async def process_url(url_index: int, filtered_url: str):
+        log.info("Processing URL %d/%d: %s...", url_index + 1, len(urls), filtered_url[:60])
         
         try:
             # Use API with proxy to fetch products
-            products_data = scraper_instance.fetch_products_api(filtered_url, user_cookies)
+            async with url_semaphore:
+                products_data = await scraper_instance.fetch_all_products(filtered_url, user_cookies, CONFIG.max_products)
             
             if not products_data:
-                print(f"[SCRAPER] No products found from this URL", file=sys.stderr)
-                continue
+                log.info("No products found from this URL")
+                return
             
             # Convert to URL format for compatibility
             product_urls = [p.get('url', f"https://www.sheinindia.in/p/{p.get('code', '')}") for p in products_data if p.get('code') or p.get('url')]
             
-            new_products = []
-            for product_url in product_urls:
-                if not user_database.is_product_seen(user_id, product_url):
-                    new_products.append(product_url)
-            
-            print(f"[SCRAPER] {len(new_products)} new products from this URL", file=sys.stderr)
+            new_products = [u for u in user_database.filter_unseen(user_id, product_urls) if u not in claimed]
+            claimed.update(new_products)
+            new_products_found.extend(new_products)
             
-            if not new_products:
-                continue
+            log.info("%d new products from this URL", len(new_products))
             
-            # Check if we can use cart-based availability check (Termux or Indian proxy)
-            from scraper import IS_TERMUX, get_indian_proxy
-            can_check_cart = IS_TERMUX or get_indian_proxy() is not None
+            if not pincodes:
+                # No pincodes means nothing to record, so skip the per-product cart checks
+                newly_seen.extend(new_products)
+                return
             
-            for product_url in new_products:
-                new_products_found.append(product_url)
-                print(f"[SCRAPER] New product: {product_url}", file=sys.stderr)
-                
-                product_id = scraper_instance.extract_product_id(product_url)
-                if not product_id:
-                    user_database.mark_product_seen(user_id, product_url)
-                    continue
-                
-                # Check availability via cart if on Termux or have Indian proxy
-                is_available = None
-                if can_check_cart and user_cookies:
-                    print(f"[SCRAPER] Checking cart availability for {product_id}...", file=sys.stderr)
-                    is_available = scraper_instance.check_availability_via_cart(product_id, user_cookies)
-                
-                # Only notify if available (or if we can't check, notify all)
-                if is_available is True or is_available is None:
-                    if pincodes:
-                        for pincode in pincodes:
-                            # If we could check and it's available, or if we couldn't check
-                            if is_available is True:
-                                is_new = user_database.save_delivery_result(user_id, product_url, pincode)
-                                if is_new:
-                                    total_deliverable += 1
-                                    print(f"[SCRAPER] AVAILABLE for {pincode}: {product_url}", file=sys.stderr)
-                            elif is_available is None:
-                                # Couldn't check, notify anyway
-                                is_new = user_database.save_delivery_result(user_id, product_url, pincode)
-                                if is_new:
-                                    total_deliverable += 1
-                                    print(f"[SCRAPER] NEW PRODUCT for {pincode}: {product_url}", file=sys.stderr)
-                elif is_available is False:
-                    print(f"[SCRAPER] Product {product_id} NOT available - skipping", file=sys.stderr)
-                
-                user_database.mark_product_seen(user_id, product_url)
+            # Cart checks are independent round-trips; url_semaphore bounds how many run at once
+            await asyncio.gather(*(process_product(product_url) for product_url in new_products))
         
         except Exception as e:
-            print(f"[SCRAPER] Error processing URL: {e}", file=sys.stderr)
-            continue
+            log.error("Error processing URL: %s", e)
+    
+    await asyncio.gather(*(process_url(url_index, filtered_url) for url_index, filtered_url in enumerate(urls)))
+    
+    # Deliveries are staged during the network work and saved in one call here
+    new_deliveries = user_database.bulk_save_delivery_results(user_id, pending_deliveries)
     
-    result = {
+    total_deliverable = len(new_deliveries)
+    for product_url, pincode in new_deliveries:
+        # Couldn't check the cart for unconfirmed products, so they are reported as new
+        label = "AVAILABLE" if product_url in cart_confirmed else "NEW PRODUCT"
+        log.info("%s for %s: %s", label, pincode, product_url)
+    
+    # One write for every product handled in this run
+    user_database.bulk_mark_products_seen(user_id, newly_seen)
+    
+    return {
         "status": "ok",
         "new_products": len(new_products_found),
         "deliverable": total_deliverable,
         "products": new_products_found[:10]
     }
+
+
+def main():
+    # Logs go to stderr so stdout carries only the JSON result
+    logging.basicConfig(level=CONFIG.log_level, format="[%(name)s] %(message)s")
+    
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "No user_id provided"}))
+        sys.exit(1)
+    
+    result = asyncio.run(run_user_check(sys.argv[1]))
     print(json.dumps(result))
+    if "error" in result:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -7,11 +7,39 @@ No browser automation - pure API requests only.
 """
 import os
 import re
+import time
+import asyncio
 import random
+import threading
+import functools
+import itertools
+import logging
 import urllib.parse
+import weakref
+import http.cookiejar
+from collections import OrderedDict
 import requests
-from typing import List, Optional, Dict, Any
-import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Optional, Dict, Any, Tuple
+from config import CONFIG
+
+login_log = logging.getLogger("LOGIN")
+api_log = logging.getLogger("API")
+delivery_log = logging.getLogger("DELIVERY")
+cart_log = logging.getLogger("CART")
+
+# orjson decodes the large product listings several times faster; Termux may not have a wheel for it
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    import json
+    _loads = json.loads
+    
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
 
 # Proxy configuration - 50 proxies for rotation
 PROXY_LIST = [
@@ -37,172 +65,273 @@ PROXY_LIST = [
 # Check if running on Termux (no proxy needed - Indian IP)
 IS_TERMUX = os.environ.get('TERMUX_VERSION') is not None or os.environ.get('NO_PROXY', '').lower() == 'true'
 
+# Product URLs look like /p/443336453_pink; the numeric part is the product ID
+_PID_RE = re.compile(r'/p/(\d+)')
+_PURL_FMT = "https://www.sheinindia.in/p/%s"
+# Category path segments for SHEIN Verse listings
+_SVERSE_RE = re.compile(r'sverse', re.I)
 
-def get_proxy():
-    """Get a random proxy with authentication. Returns None if on Termux or NO_PROXY=true."""
-    if IS_TERMUX:
-        return None
+# Read-only stand-in for absent nested objects in API responses; never mutate it
+_EMPTY: Dict[str, Any] = {}
+
+# Headers sent with every request (installed on the shared session)
+_COMMON_HEADERS = {
+    'accept': 'application/json',
+    'user-agent': 'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
+    'x-tenant-id': 'SHEIN',
+    'sec-ch-ua': '"Chromium";v="137", "Not/A)Brand";v="24"',
+    'sec-ch-ua-mobile': '?1',
+    'sec-ch-ua-platform': '"Android"',
+}
+
+# Extra headers for the category listing API
+_LISTING_HEADERS = {
+    'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-origin',
+}
+
+# Anonymous cookies used when the user has not logged in
+_BASE_COOKIES = {
+    "V": "1",
+    "deviceId": "R8RkVsXwi4j0zW82Wu8iK",
+    "LS": "LOGGED_IN",
+    "customerType": "Existing",
+    "bookingType": "SHEIN",
+    "storeTypes": "shein",
+}
+# Cookie headers built once: the listing API gets all of them, delivery and cart checks the first four
+_BASE_COOKIE_HEADER = "; ".join(map("=".join, _BASE_COOKIES.items())) + ";"
+_CHECK_COOKIE_HEADER = "; ".join(map("=".join, list(_BASE_COOKIES.items())[:4])) + ";"
+
+
+def _create_session() -> requests.Session:
+    """Create an HTTP session that keeps connections to SHEIN alive between calls."""
+    session = requests.Session()
+    # Idempotent requests are retried on gateway errors; POSTs (cart, login) are not
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # requests' default Accept-Encoding already offers gzip/deflate, plus br when brotli is installed
+    session.headers.update(_COMMON_HEADERS)
+    # The session is shared by every user, so it must never remember anyone's cookies
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+# Shared session - reuses TCP/TLS connections across API calls and threads
+_SESSION = _create_session()
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ttl seconds."""
     
-    # Check for Indian proxy first (for delivery checks)
-    indian_proxy = os.environ.get('INDIAN_PROXY', '')
-    if indian_proxy:
-        username = os.environ.get('PROXY_USERNAME', '')
-        password = os.environ.get('PROXY_PASSWORD', '')
-        if username and password:
-            return {
-                'http': f'http://{username}:{password}@{indian_proxy}',
-                'https': f'http://{username}:{password}@{indian_proxy}'
-            }
-        return {
-            'http': f'http://{indian_proxy}',
-            'https': f'http://{indian_proxy}'
-        }
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
     
-    # Fallback to regular proxy list
-    proxy_ip = random.choice(PROXY_LIST)
-    username = os.environ.get('PROXY_USERNAME', '')
-    password = os.environ.get('PROXY_PASSWORD', '')
-    if username and password:
-        return {
-            'http': f'http://{username}:{password}@{proxy_ip}',
-            'https': f'http://{username}:{password}@{proxy_ip}'
-        }
-    return None
+    def get(self, key):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value) -> None:
+        """Store a value, evicting the least recently used entries past maxsize."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Short-lived API response caches (users often share URLs and pincodes).
+# Keys record only whether the caller was logged in, not whose cookies were sent,
+# so every logged-in user checking the same URL or pincode shares one entry.
+_PRODUCTS_CACHE = _TTLCache(maxsize=256, ttl=CONFIG.product_cache_seconds)
+_DELIVERY_CACHE = _TTLCache(maxsize=10000, ttl=CONFIG.delivery_cache_seconds)
+
+# Proxies are handed out round-robin from a shuffled order; one that fails is
+# skipped until its cooldown (time.monotonic() deadline) has passed
+_PROXY_CYCLE = itertools.cycle(random.sample(PROXY_LIST, len(PROXY_LIST)))
+_PROXY_PENALTY: Dict[str, float] = {}
+_PROXY_LOCK = threading.Lock()
+
+
+def _next_proxy_ip() -> str:
+    """Return the next proxy in rotation that is not cooling down after a failure."""
+    now = time.monotonic()
+    with _PROXY_LOCK:
+        for _ in range(len(PROXY_LIST)):
+            proxy_ip = next(_PROXY_CYCLE)
+            if _PROXY_PENALTY.get(proxy_ip, 0) <= now:
+                return proxy_ip
+        # Every proxy is cooling down; keep rotating rather than stall
+        return next(_PROXY_CYCLE)
+
+
+def mark_proxy_failed(proxy_ip: str, cooldown: float = 60) -> None:
+    """Skip a proxy for cooldown seconds after it timed out, refused or returned 5xx."""
+    with _PROXY_LOCK:
+        _PROXY_PENALTY[proxy_ip] = time.monotonic() + cooldown
+
+
+def _send(method: str, url: str, proxies: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+    """
+    Send a request on the shared session, putting the proxy on cooldown if it fails.
+    A json= body is encoded here with _dumps instead of by requests.
+    """
+    if 'json' in kwargs:
+        kwargs['data'] = _dumps(kwargs.pop('json'))
+        kwargs['headers'] = {**kwargs.get('headers', _EMPTY), 'content-type': 'application/json'}
+    # Proxy URLs are http://[user:pass@]ip:port
+    proxy_ip = proxies['https'].rsplit('@', 1)[-1].split('//')[-1] if proxies else None
+    try:
+        response = _SESSION.request(method, url, proxies=proxies, **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        if proxy_ip:
+            mark_proxy_failed(proxy_ip)
+        raise
+    if proxy_ip and response.status_code >= 500:
+        mark_proxy_failed(proxy_ip)
+    return response
+
+
+@functools.lru_cache(maxsize=128)
+def _proxy_dict(proxy_ip: str, username: str, password: str) -> Dict[str, str]:
+    """Build the requests proxies mapping for one proxy (memoized; the result is shared, so don't mutate it)."""
+    auth = f'{username}:{password}@' if username and password else ''
+    return {
+        'http': f'http://{auth}{proxy_ip}',
+        'https': f'http://{auth}{proxy_ip}'
+    }
+
+
+def _json_body(response: requests.Response) -> Any:
+    """
+    Decode a JSON response body. Returns None for an empty or non-JSON body
+    (e.g. an HTML Access Denied page), which is spotted from its first byte without parsing.
+    """
+    body = response.content.lstrip()
+    if body[:1] not in (b'{', b'['):
+        return None
+    try:
+        return _loads(body)
+    except ValueError:
+        return None
 
 
 def get_indian_proxy():
     """Get Indian proxy for delivery checks (cart API). Returns None if not available."""
-    if IS_TERMUX:
+    if IS_TERMUX or not CONFIG.indian_proxy:
         return None  # No proxy needed on Termux
+    return _proxy_dict(CONFIG.indian_proxy, CONFIG.proxy_username, CONFIG.proxy_password)
+
+
+def get_proxy():
+    """Get the next proxy in rotation with authentication. Returns None if on Termux or NO_PROXY=true."""
+    if IS_TERMUX:
+        return None
     
-    indian_proxy = os.environ.get('INDIAN_PROXY', '')
+    # Check for Indian proxy first (for delivery checks)
+    indian_proxy = get_indian_proxy()
     if indian_proxy:
-        username = os.environ.get('PROXY_USERNAME', '')
-        password = os.environ.get('PROXY_PASSWORD', '')
-        if username and password:
-            return {
-                'http': f'http://{username}:{password}@{indian_proxy}',
-                'https': f'http://{username}:{password}@{indian_proxy}'
-            }
-        return {
-            'http': f'http://{indian_proxy}',
-            'https': f'http://{indian_proxy}'
-        }
-    return None
+        return indian_proxy
+    
+    # Fallback to regular proxy list, which needs credentials
+    if not (CONFIG.proxy_username and CONFIG.proxy_password):
+        return None
+    return _proxy_dict(_next_proxy_ip(), CONFIG.proxy_username, CONFIG.proxy_password)
 
 
+@functools.lru_cache(maxsize=4096)
 def extract_product_id(product_url: str) -> Optional[str]:
-    """Extract base product ID from URL like /p/443336453_pink"""
-    match = re.search(r'/p/(\d+)', product_url)
-    if match:
-        return match.group(1)
-    return None
+    """Extract base product ID from URL like /p/443336453_pink (memoized; URLs recur across checks)"""
+    match = _PID_RE.search(product_url)
+    return match.group(1) if match else None
 
 
 def api_login_request_otp(phone_number: str) -> Dict[str, Any]:
     """
-    Request OTP via SHEIN API using cURL - sends OTP to phone.
+    Request OTP via SHEIN API - sends OTP to phone.
     Returns dict with 'success', 'error' keys.
     """
-    import subprocess
-    import json as json_module
-    
     try:
-        print(f"[LOGIN] Requesting OTP for phone: {phone_number}")
-        
-        curl_cmd = [
-            'curl', '-s', '-L', '--compressed',
-            '-X', 'POST',
-            '-H', 'accept: application/json',
-            '-H', 'content-type: application/json',
-            '-H', 'origin: https://www.sheinindia.in',
-            '-H', 'referer: https://www.sheinindia.in/login?referrer=/my-account/',
-            '-H', 'user-agent: Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
-            '-H', 'x-tenant-id: SHEIN',
-            '-d', json_module.dumps({"mobileNumber": phone_number}),
-            '--max-time', '20'
-        ]
-        
-        proxy = get_proxy()
-        if proxy:
-            proxy_url = proxy.get('http', '') or proxy.get('https', '')
-            if proxy_url:
-                curl_cmd.extend(['--proxy', proxy_url])
-        
-        curl_cmd.append('https://www.sheinindia.in/api/auth/generateLoginOTP')
-        
-        result = subprocess.run(curl_cmd, capture_output=True, text=True, timeout=25)
-        
-        if result.returncode == 0:
-            output = result.stdout.strip()
-            if 'Access Denied' in output:
-                return {"success": False, "error": "Access denied - try again"}
-            print(f"[LOGIN] OTP sent to {phone_number}")
-            return {"success": True, "error": None}
-        else:
-            return {"success": False, "error": "Failed to send OTP request"}
+        login_log.info("Requesting OTP for phone: %s", phone_number)
         
-    except subprocess.TimeoutExpired:
+        headers = {
+            'origin': 'https://www.sheinindia.in',
+            'referer': 'https://www.sheinindia.in/login?referrer=/my-account/',
+        }
+        
+        response = _send(
+            'POST', 'https://www.sheinindia.in/api/auth/generateLoginOTP',
+            json={"mobileNumber": phone_number},
+            headers=headers,
+            proxies=get_proxy(),
+            timeout=20
+        )
+        
+        if b'Access Denied' in response.content:
+            return {"success": False, "error": "Access denied - try again"}
+        login_log.info("OTP sent to %s", phone_number)
+        return {"success": True, "error": None}
+        
+    except requests.Timeout:
         return {"success": False, "error": "Request timed out"}
+    except requests.RequestException:
+        return {"success": False, "error": "Failed to send OTP request"}
     except Exception as e:
-        print(f"[LOGIN] Error requesting OTP: {e}")
+        login_log.error("Error requesting OTP: %s", e)
         return {"success": False, "error": str(e)}
 
 
 def api_login_verify_otp(phone_number: str, otp: str) -> Dict[str, Any]:
     """
-    Verify OTP via SHEIN API using cURL and return cookies on success.
+    Verify OTP via SHEIN API and return cookies on success.
     Returns dict with 'success', 'cookies' (string), 'error' keys.
     """
-    import subprocess
-    import json as json_module
-    
     try:
-        print(f"[LOGIN] Verifying OTP for {phone_number}")
-        
-        curl_cmd = [
-            'curl', '-s', '-L', '--compressed',
-            '-X', 'POST',
-            '-H', 'accept: application/json',
-            '-H', 'content-type: application/json',
-            '-H', 'origin: https://www.sheinindia.in',
-            '-H', 'referer: https://www.sheinindia.in/login/otp?referrer=/my-account/',
-            '-H', 'user-agent: Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
-            '-H', 'x-tenant-id: SHEIN',
-            '-d', json_module.dumps({"username": phone_number, "otp": otp}),
-            '-c', '-',  # Output cookies to stdout
-            '-D', '-',  # Output headers to stdout
-            '--max-time', '20'
-        ]
-        
-        proxy = get_proxy()
-        if proxy:
-            proxy_url = proxy.get('http', '') or proxy.get('https', '')
-            if proxy_url:
-                curl_cmd.extend(['--proxy', proxy_url])
-        
-        curl_cmd.append('https://www.sheinindia.in/api/auth/login')
-        
-        result = subprocess.run(curl_cmd, capture_output=True, text=True, timeout=25)
-        
-        if result.returncode != 0:
-            return {"success": False, "cookies": None, "error": "Login request failed"}
-        
-        output = result.stdout
-        
-        if 'Access Denied' in output:
-            return {"success": False, "cookies": None, "error": "Access denied - try again"}
+        login_log.info("Verifying OTP for %s", phone_number)
         
-        # Extract JSON from response (after headers)
-        json_start = output.rfind('{')
-        if json_start == -1:
-            return {"success": False, "cookies": None, "error": "Invalid response"}
+        headers = {
+            'origin': 'https://www.sheinindia.in',
+            'referer': 'https://www.sheinindia.in/login/otp?referrer=/my-account/',
+        }
         
-        try:
-            resp_data = json_module.loads(output[json_start:])
-        except:
+        response = _send(
+            'POST', 'https://www.sheinindia.in/api/auth/login',
+            json={"username": phone_number, "otp": otp},
+            headers=headers,
+            proxies=get_proxy(),
+            timeout=20
+        )
+        
+        if b'Access Denied' in response.content:
+            return {"success": False, "cookies": None, "error": "Access denied - try again"}
+        
+        resp_data = _json_body(response)
+        if resp_data is None:
             return {"success": False, "cookies": None, "error": "Could not parse response"}
         
+        if not isinstance(resp_data, dict):
+            return {"success": False, "cookies": None, "error": "Invalid response"}
+        
         # Check for error in response
         if 'error' in resp_data or resp_data.get('statusCode', 0) >= 400:
             error_msg = resp_data.get('message', resp_data.get('error', 'Login failed'))
@@ -215,23 +344,16 @@ def api_login_verify_otp(phone_number: str, otp: str) -> Dict[str, Any]:
         if 'refreshToken' in resp_data:
             cookies_dict['R'] = resp_data['refreshToken']
         
-        # Extract cookies from headers
-        for line in output.split('\n'):
-            if line.lower().startswith('set-cookie:'):
-                cookie_part = line.split(':', 1)[1].strip()
-                if '=' in cookie_part:
-                    name_val = cookie_part.split(';')[0]
-                    if '=' in name_val:
-                        name, val = name_val.split('=', 1)
-                        cookies_dict[name.strip()] = val.strip()
+        # Set-Cookie headers are already parsed by the cookie jar (folding, quoting, attributes)
+        cookies_dict.update(response.cookies.get_dict())
         
         # Add default cookies
         cookies_dict['LS'] = 'LOGGED_IN'
         cookies_dict['customerType'] = 'Existing'
         
-        cookie_string = "; ".join([f"{k}={v}" for k, v in cookies_dict.items()])
+        cookie_string = "; ".join(map("=".join, cookies_dict.items()))
         
-        print(f"[LOGIN] Login successful! Got {len(cookies_dict)} cookies")
+        login_log.info("Login successful! Got %d cookies", len(cookies_dict))
         
         return {
             "success": True,
@@ -239,21 +361,34 @@ def api_login_verify_otp(phone_number: str, otp: str) -> Dict[str, Any]:
             "error": None
         }
         
-    except subprocess.TimeoutExpired:
+    except requests.Timeout:
         return {"success": False, "cookies": None, "error": "Request timed out"}
+    except requests.RequestException:
+        return {"success": False, "cookies": None, "error": "Login request failed"}
     except Exception as e:
-        print(f"[LOGIN] Error verifying OTP: {e}")
+        login_log.error("Error verifying OTP: %s", e)
         return {"success": False, "cookies": None, "error": str(e)}
 
 
-def fetch_products_api(filtered_url: str, user_cookies: str = None) -> List[Dict[str, Any]]:
+# Products per listing page requested from the category API
+PAGE_SIZE = 60
+
+
+def fetch_products_api(filtered_url: str, user_cookies: str = None, page: int = 0) -> List[Dict[str, Any]]:
     """
-    Fetch products via SHEIN API using cURL subprocess.
-    Uses cURL to bypass blocking that Python requests might trigger.
+    Fetch one page of products via SHEIN API using the shared HTTP session.
     Returns list of product dicts with code, name, price, image, url.
     """
-    import subprocess
-    import json as json_module
+    return _fetch_products_page(filtered_url, user_cookies, page)[0]
+
+
+def _fetch_products_page(filtered_url: str, user_cookies: str = None, page: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Fetch one listing page. Returns (products, number of pages in the listing)."""
+    cache_key = (filtered_url, bool(user_cookies), page)
+    cached = _PRODUCTS_CACHE.get(cache_key)
+    if cached is not None:
+        api_log.debug("Using cached products for: %s (page %d)", filtered_url[:60], page + 1)
+        return cached
     
     try:
         parsed = urllib.parse.urlparse(filtered_url)
@@ -261,7 +396,7 @@ def fetch_products_api(filtered_url: str, user_cookies: str = None) -> List[Dict
         
         category_code = None
         for part in path_parts:
-            if 'sverse' in part.lower() or part.startswith('c/'):
+            if _SVERSE_RE.search(part) or part.startswith('c/'):
                 category_code = part.replace('c/', '')
                 break
         
@@ -272,8 +407,8 @@ def fetch_products_api(filtered_url: str, user_cookies: str = None) -> List[Dict
                 category_code = path_parts[-1]
         
         if not category_code:
-            print(f"[API] Could not extract category from URL: {filtered_url}")
-            return []
+            api_log.warning("Could not extract category from URL: %s", filtered_url)
+            return [], 0
         
         query_params = urllib.parse.parse_qs(parsed.query)
         facets = query_params.get('facets', [''])[0]
@@ -285,8 +420,8 @@ def fetch_products_api(filtered_url: str, user_cookies: str = None) -> List[Dict
         
         params = {
             'fields': 'SITE',
-            'currentPage': '0',
-            'pageSize': '60',
+            'currentPage': str(page),
+            'pageSize': str(PAGE_SIZE),
             'format': 'json',
             'gridColumns': '2',
             'segmentIds': '15,8,19',
@@ -306,142 +441,103 @@ def fetch_products_api(filtered_url: str, user_cookies: str = None) -> List[Dict
         query_string = urllib.parse.urlencode(params)
         api_url = f"https://www.sheinindia.in/api/category/{category_code}?{query_string}"
         
-        base_cookies = 'V=1; deviceId=R8RkVsXwi4j0zW82Wu8iK; LS=LOGGED_IN; customerType=Existing; bookingType=SHEIN; storeTypes=shein;'
-        cookies = user_cookies if user_cookies else base_cookies
-        
-        curl_cmd = [
-            'curl', '-s', '-L', '--compressed',
-            '-H', 'accept: application/json',
-            '-H', 'accept-language: en-GB,en-US;q=0.9,en;q=0.8',
-            '-H', f'referer: {filtered_url}',
-            '-H', 'user-agent: Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
-            '-H', 'x-tenant-id: SHEIN',
-            '-H', 'sec-ch-ua: "Chromium";v="137", "Not/A)Brand";v="24"',
-            '-H', 'sec-ch-ua-mobile: ?1',
-            '-H', 'sec-ch-ua-platform: "Android"',
-            '-H', 'sec-fetch-dest: empty',
-            '-H', 'sec-fetch-mode: cors',
-            '-H', 'sec-fetch-site: same-origin',
-            '-H', f'cookie: {cookies}',
-            '--max-time', '30'
-        ]
-        
-        proxy = get_proxy()
-        if proxy:
-            proxy_url = proxy.get('http', '') or proxy.get('https', '')
-            if proxy_url:
-                curl_cmd.extend(['--proxy', proxy_url])
-        
-        curl_cmd.append(api_url)
-        
-        print(f"[API] Fetching products from: https://www.sheinindia.in/api/category/{category_code}")
-        
-        result = subprocess.run(curl_cmd, capture_output=True, text=True, timeout=35)
-        
-        if result.returncode != 0:
-            print(f"[API] cURL failed: {result.stderr[:100] if result.stderr else 'Unknown error'}")
-            return []
-        
-        output = result.stdout.strip()
-        if not output:
-            print(f"[API] Empty response from cURL")
-            return []
+        headers = {
+            **_LISTING_HEADERS,
+            'referer': filtered_url,
+            'cookie': user_cookies or _BASE_COOKIE_HEADER
+        }
         
-        try:
-            data = json_module.loads(output)
-        except json_module.JSONDecodeError:
-            if 'Access Denied' in output or '403' in output:
-                print(f"[API] Access denied (403)")
+        api_log.debug("Fetching products from: https://www.sheinindia.in/api/category/%s", category_code)
+        
+        response = _send('GET', api_url, headers=headers, proxies=get_proxy(), timeout=(5, 25))
+        
+        data = _json_body(response)
+        if data is None:
+            output = response.text.strip()
+            if not output:
+                api_log.warning("Empty response (HTTP %s)", response.status_code)
+            elif 'Access Denied' in output or '403' in output:
+                api_log.warning("Access denied (403)")
             else:
-                print(f"[API] Invalid JSON response: {output[:100]}")
-            return []
+                api_log.warning("Invalid JSON response: %s", output[:100])
+            return [], 0
         
-        products = data.get('products', [])
+        products = data.get('products') or ()
         
-        pagination = data.get('pagination', {})
+        pagination = data.get('pagination') or _EMPTY
         total_results = pagination.get('totalNumberOfResults', 0)
         total_pages = pagination.get('numberOfPages', 0)
         current_page = pagination.get('currentPage', 0)
         
         if total_results > 0:
-            print(f"[API] Total products available: {total_results} (page {current_page + 1}/{total_pages})")
+            api_log.debug("Total products available: %s (page %d/%d)", total_results, current_page + 1, total_pages)
         
         result_list = []
+        append = result_list.append
         for p in products:
-            code = p.get('code', '')
+            code = p.get('code')
             if not code:
                 continue
             
-            color_data = p.get('fnlColorVariantData', {})
-            product_info = {
+            # Missing or null sub-objects fall back to the shared empty dict
+            color_data = p.get('fnlColorVariantData') or _EMPTY
+            append({
                 'code': code,
-                'name': color_data.get('brandName', '') + ' ' + p.get('name', ''),
-                'price': p.get('price', {}).get('value', 0),
+                'name': f"{color_data.get('brandName', '')} {p.get('name', '')}",
+                'price': (p.get('price') or _EMPTY).get('value', 0),
                 'image': color_data.get('outfitPictureURL', ''),
-                'url': f"https://www.sheinindia.in/p/{code}"
-            }
-            result_list.append(product_info)
+                'url': _PURL_FMT % code
+            })
         
-        print(f"[API] Found {len(result_list)} products via cURL")
-        return result_list
+        api_log.info("Found %d products", len(result_list))
+        result = (result_list, total_pages)
+        _PRODUCTS_CACHE.set(cache_key, result)
+        return result
             
-    except subprocess.TimeoutExpired:
-        print(f"[API] cURL timeout")
-        return []
+    except requests.Timeout:
+        api_log.warning("Request timeout")
+        return [], 0
     except Exception as e:
-        print(f"[API] Error fetching products: {e}")
-        return []
+        api_log.error("Error fetching products: %s", e)
+        return [], 0
 
 
 def check_delivery_via_api(product_id: str, pincode: str, user_cookies: str = None) -> Optional[bool]:
     """
-    Check delivery via SHEIN India API using cURL subprocess.
+    Check delivery via SHEIN India API, reusing recent answers for the same product and pincode.
     Returns True if deliverable, False if not, None if unable to determine.
     """
-    import subprocess
-    import json as json_module
+    cache_key = (product_id, pincode, bool(user_cookies))
+    cached = _DELIVERY_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
     
-    base_cookies = 'V=1; deviceId=R8RkVsXwi4j0zW82Wu8iK; LS=LOGGED_IN; customerType=Existing;'
-    cookies = user_cookies if user_cookies else base_cookies
+    result = _request_delivery_status(product_id, pincode, user_cookies)
+    if result is not None:
+        _DELIVERY_CACHE.set(cache_key, result)
+    return result
+
+
+def _request_delivery_status(product_id: str, pincode: str, user_cookies: str = None) -> Optional[bool]:
+    """
+    Query the SHEIN India delivery API using the shared HTTP session.
+    Returns True if deliverable, False if not, None if unable to determine.
+    """
+    cookies = user_cookies or _CHECK_COOKIE_HEADER
     
     url = f"https://www.sheinindia.in/api/edd/checkDeliveryDetails?productCode={product_id}&postalCode={pincode}&quantity=1&IsExchange=false"
     
-    curl_cmd = [
-        'curl', '-s', '-L', '--compressed',
-        '-H', 'accept: application/json',
-        '-H', f'referer: https://www.sheinindia.in/p/{product_id}',
-        '-H', 'user-agent: Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
-        '-H', 'x-tenant-id: SHEIN',
-        '-H', 'sec-ch-ua: "Chromium";v="137", "Not/A)Brand";v="24"',
-        '-H', 'sec-ch-ua-mobile: ?1',
-        '-H', 'sec-ch-ua-platform: "Android"',
-        '-H', f'cookie: {cookies}',
-        '--max-time', '15'
-    ]
-    
-    proxy = get_proxy()
-    if proxy:
-        proxy_url = proxy.get('http', '') or proxy.get('https', '')
-        if proxy_url:
-            curl_cmd.extend(['--proxy', proxy_url])
-    
-    curl_cmd.append(url)
+    headers = {
+        'referer': f'https://www.sheinindia.in/p/{product_id}',
+        'cookie': cookies
+    }
     
     try:
-        result = subprocess.run(curl_cmd, capture_output=True, text=True, timeout=20)
-        
-        if result.returncode != 0:
-            return None
+        response = _send('GET', url, headers=headers, proxies=get_proxy(), timeout=15)
         
-        output = result.stdout.strip()
-        if not output:
-            return None
-        
-        try:
-            data = json_module.loads(output)
-        except json_module.JSONDecodeError:
-            if 'Access Denied' in output:
-                return None
+        data = _json_body(response)
+        if not isinstance(data, dict):
+            # Empty, non-JSON or Access Denied page
             return None
         
         if 'servicability' in data:
@@ -449,40 +545,198 @@ def check_delivery_via_api(product_id: str, pincode: str, user_cookies: str = No
                 edd = ''
                 if 'productDetails' in data and data['productDetails']:
                     edd = data['productDetails'][0].get('eddUpper', '')
-                print(f"[DELIVERY] {product_id} -> {pincode}: YES (EDD: {edd})")
+                delivery_log.debug("%s -> %s: YES (EDD: %s)", product_id, pincode, edd)
                 return True
             else:
-                print(f"[DELIVERY] {product_id} -> {pincode}: NO")
+                delivery_log.debug("%s -> %s: NO", product_id, pincode)
                 return False
         
         if 'serviceable' in data:
             if data['serviceable']:
-                print(f"[DELIVERY] {product_id} -> {pincode}: YES")
+                delivery_log.debug("%s -> %s: YES", product_id, pincode)
                 return True
             else:
-                print(f"[DELIVERY] {product_id} -> {pincode}: NO")
+                delivery_log.debug("%s -> %s: NO", product_id, pincode)
                 return False
         
         return None
         
-    except subprocess.TimeoutExpired:
+    except requests.Timeout:
         return None
     except Exception as e:
-        print(f"[DELIVERY] Error: {e}")
+        delivery_log.error("Error: %s", e)
         return None
 
 
+# Whether the EDD endpoint answers several postal codes in one POST; None until first probed
+_EDD_BATCH_SUPPORTED: Optional[bool] = None
+# Statuses that mean the endpoint itself rejects multi-pincode requests
+_EDD_UNSUPPORTED_STATUSES = frozenset((400, 404, 405, 422))
+# While undecided, one caller probes and the rest go straight to single-pincode checks.
+# After EDD_MAX_INCONCLUSIVE_PROBES probes in a row without a verdict (blocked proxy,
+# 5xx, network errors) lookups are switched off until EDD_PROBE_COOLDOWN_SECONDS pass.
+EDD_MAX_INCONCLUSIVE_PROBES = 3
+EDD_PROBE_COOLDOWN_SECONDS = 600
+_EDD_PROBE_LOCK = threading.Lock()  # guards the probe state below, never held across a request
+_EDD_PROBING = False
+_EDD_INCONCLUSIVE = 0
+_EDD_RETRY_AT: Optional[float] = None  # set while switched off for a cooldown rather than for good
+
+
+def _mark_edd_batch_unsupported() -> None:
+    """Turn multi-pincode lookups off, unless an earlier request already showed they work."""
+    global _EDD_BATCH_SUPPORTED, _EDD_RETRY_AT
+    with _EDD_PROBE_LOCK:
+        if _EDD_BATCH_SUPPORTED is None:
+            delivery_log.info("Multi-pincode lookups not supported, checking pincodes one at a time")
+            _EDD_BATCH_SUPPORTED = False
+            _EDD_RETRY_AT = None
+
+
+def _edd_batch_usable() -> bool:
+    """False while multi-pincode lookups are off; ends a cooldown once it has expired."""
+    global _EDD_BATCH_SUPPORTED, _EDD_RETRY_AT
+    if _EDD_BATCH_SUPPORTED is False and _EDD_RETRY_AT is not None and time.monotonic() >= _EDD_RETRY_AT:
+        with _EDD_PROBE_LOCK:
+            if _EDD_RETRY_AT is not None and time.monotonic() >= _EDD_RETRY_AT:
+                _EDD_BATCH_SUPPORTED = None
+                _EDD_RETRY_AT = None
+    return _EDD_BATCH_SUPPORTED is not False
+
+
+def _start_edd_probe() -> bool:
+    """Claim the single probe slot while the verdict is open. False if lookups are settled on or another caller is probing."""
+    global _EDD_PROBING
+    with _EDD_PROBE_LOCK:
+        if _EDD_BATCH_SUPPORTED is not None or _EDD_PROBING:
+            return False
+        _EDD_PROBING = True
+        return True
+
+
+def _finish_edd_probe(conclusive: bool) -> None:
+    """Release the probe slot, counting inconclusive probes toward a cooldown."""
+    global _EDD_PROBING, _EDD_INCONCLUSIVE, _EDD_BATCH_SUPPORTED, _EDD_RETRY_AT
+    with _EDD_PROBE_LOCK:
+        _EDD_PROBING = False
+        if conclusive:
+            _EDD_INCONCLUSIVE = 0
+            return
+        _EDD_INCONCLUSIVE += 1
+        if _EDD_BATCH_SUPPORTED is None and _EDD_INCONCLUSIVE >= EDD_MAX_INCONCLUSIVE_PROBES:
+            delivery_log.warning("Multi-pincode probe failed %d times, retrying in %ds",
+                                 _EDD_INCONCLUSIVE, EDD_PROBE_COOLDOWN_SECONDS)
+            _EDD_BATCH_SUPPORTED = False
+            _EDD_RETRY_AT = time.monotonic() + EDD_PROBE_COOLDOWN_SECONDS
+            _EDD_INCONCLUSIVE = 0
+
+
+def _request_delivery_multi(product_id: str, pincodes: List[str], user_cookies: str = None) -> Dict[str, bool]:
+    """
+    Ask the delivery API about every pincode for one product in a single POST.
+    Returns {pincode: deliverable} for the pincodes it answered; empty if the
+    endpoint doesn't support it (which is remembered); None if the reply said
+    nothing either way (blocked proxy, 5xx, network error).
+    """
+    global _EDD_BATCH_SUPPORTED
+    
+    headers = {
+        'origin': 'https://www.sheinindia.in',
+        'referer': f'https://www.sheinindia.in/p/{product_id}',
+        'cookie': user_cookies or _CHECK_COOKIE_HEADER
+    }
+    
+    try:
+        response = _send(
+            'POST', 'https://www.sheinindia.in/api/edd/checkDeliveryDetails',
+            json={"productCode": product_id, "postalCodes": pincodes, "quantity": 1},
+            headers=headers,
+            proxies=get_proxy(),
+            timeout=15
+        )
+    except requests.RequestException:
+        # A network failure says nothing about whether the endpoint supports this
+        return None
+    
+    status = response.status_code
+    if status in _EDD_UNSUPPORTED_STATUSES:
+        _mark_edd_batch_unsupported()
+        return {}
+    if not 200 <= status < 300:
+        # 403/429 and 5xx usually mean a blocked or overloaded proxy, not a missing endpoint
+        return None
+    
+    data = _json_body(response)
+    if data is None:
+        # An empty or non-JSON body (e.g. a proxy's error page) is not a verdict either
+        return None
+    
+    # Expect one entry per postal code: [{"postalCode": ..., "servicability": ...}, ...]
+    answers = {}
+    if isinstance(data, list):
+        for entry in data:
+            if not isinstance(entry, dict) or 'postalCode' not in entry:
+                continue
+            verdict = entry.get('servicability', entry.get('serviceable'))
+            if isinstance(verdict, bool):
+                answers[str(entry['postalCode'])] = verdict
+    
+    if not answers:
+        # A well-formed reply in a shape we don't recognise
+        _mark_edd_batch_unsupported()
+        return {}
+    
+    _EDD_BATCH_SUPPORTED = True
+    for pincode, verdict in answers.items():
+        delivery_log.debug("%s -> %s: %s", product_id, pincode, 'YES' if verdict else 'NO')
+    return answers
+
+
+def _check_delivery_multi(product_id: str, pincodes: List[str], user_cookies: str = None) -> Dict[str, bool]:
+    """
+    Resolve as many pincodes as possible for one product from the cache plus one
+    multi-pincode request. Pincodes missing from the result still need single checks.
+    """
+    results = {}
+    missing = []
+    for pincode in pincodes:
+        cached = _DELIVERY_CACHE.get((product_id, pincode, bool(user_cookies)))
+        if cached is not None:
+            results[pincode] = cached
+        else:
+            missing.append(pincode)
+    
+    if len(missing) < 2 or not _edd_batch_usable():
+        return results
+    
+    # Until the endpoint is known to work, only one caller probes it; the others
+    # fall through to single-pincode checks instead of waiting for the verdict
+    probing = _start_edd_probe()
+    if not probing and _EDD_BATCH_SUPPORTED is not True:
+        return results
+    
+    answers = None
+    try:
+        answers = _request_delivery_multi(product_id, missing, user_cookies)
+    finally:
+        if probing:
+            _finish_edd_probe(answers is not None)
+    if not answers:
+        return results
+    
+    for pincode, verdict in answers.items():
+        _DELIVERY_CACHE.set((product_id, pincode, bool(user_cookies)), verdict)
+    results.update(answers)
+    return results
+
+
 def check_availability_via_cart(product_id: str, user_cookies: str = None) -> Optional[bool]:
     """
-    Check product availability using cart API via cURL.
+    Check product availability using cart API via the shared HTTP session.
     Works on Termux (no proxy) or with Indian proxies.
     Returns True if product can be added to cart, False if not, None if unable to determine.
     """
-    import subprocess
-    import json as json_module
-    
-    base_cookies = 'V=1; deviceId=R8RkVsXwi4j0zW82Wu8iK; LS=LOGGED_IN; customerType=Existing;'
-    cookies = user_cookies if user_cookies else base_cookies
+    cookies = user_cookies or _CHECK_COOKIE_HEADER
     
     proxy = get_indian_proxy()
     
@@ -491,58 +745,165 @@ def check_availability_via_cart(product_id: str, user_cookies: str = None) -> Op
         add_url = f'https://www.sheinindia.in/api/cart/add'
         add_data = {"productCode": product_id, "quantity": 1}
         
-        curl_cmd = [
-            'curl', '-s', '-L', '--compressed',
-            '-X', 'POST',
-            '-H', 'accept: application/json',
-            '-H', 'content-type: application/json',
-            '-H', f'cookie: {cookies}',
-            '-H', 'origin: https://www.sheinindia.in',
-            '-H', f'referer: https://www.sheinindia.in/p/{product_id}',
-            '-H', 'user-agent: Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36',
-            '-H', 'x-tenant-id: SHEIN',
-            '-d', json_module.dumps(add_data),
-            '--max-time', '15'
-        ]
-        
-        if proxy:
-            proxy_url = proxy.get('http', '') or proxy.get('https', '')
-            if proxy_url:
-                curl_cmd.extend(['--proxy', proxy_url])
-        
-        curl_cmd.append(add_url)
-        
-        result = subprocess.run(curl_cmd, capture_output=True, text=True, timeout=20)
-        
-        if result.returncode != 0:
-            return None
+        headers = {
+            'cookie': cookies,
+            'origin': 'https://www.sheinindia.in',
+            'referer': f'https://www.sheinindia.in/p/{product_id}',
+        }
+        
+        response = _send('POST', add_url, json=add_data, headers=headers, proxies=proxy, timeout=15)
         
-        output = result.stdout.strip()
+        resp_data = _json_body(response)
         
-        if 'Access Denied' in output:
-            print(f"[CART] Blocked - need Indian IP or Termux")
+        if resp_data is None:
+            if b'Access Denied' in response.content:
+                cart_log.warning("Blocked - need Indian IP or Termux")
             return None
         
         try:
-            resp_data = json_module.loads(output)
             if resp_data.get('success') or 'cartId' in resp_data:
-                print(f"[CART] Product {product_id} CAN be added")
+                cart_log.debug("Product %s CAN be added", product_id)
                 return True
             if 'outOfStock' in str(resp_data) or 'sold out' in str(resp_data).lower():
-                print(f"[CART] Product {product_id} OUT OF STOCK")
+                cart_log.debug("Product %s OUT OF STOCK", product_id)
                 return False
         except:
             pass
         
         return None
         
-    except subprocess.TimeoutExpired:
+    except requests.Timeout:
         return None
     except Exception as e:
-        print(f"[CART] Error: {e}")
+        cart_log.error("Error: %s", e)
         return None
 
 
+# Shared cap for callers that don't pass a semaphore, one per event loop: the sync wrappers
+# run each call under a fresh asyncio.run(), and a semaphore can't be shared across loops
+_DEFAULT_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _default_semaphore() -> asyncio.Semaphore:
+    """Return the running loop's shared CONFIG.max_delivery_workers semaphore."""
+    loop = asyncio.get_running_loop()
+    semaphore = _DEFAULT_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _DEFAULT_SEMAPHORES[loop] = asyncio.BoundedSemaphore(CONFIG.max_delivery_workers)
+    return semaphore
+
+
+async def _run_bounded(semaphore: asyncio.Semaphore, func, *args):
+    """Run one blocking check in a worker thread once the semaphore lets it through."""
+    async with semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+async def check_deliveries_batch(pairs: List[tuple], user_cookies: str = None,
+                                 semaphore: asyncio.Semaphore = None) -> List[Optional[bool]]:
+    """
+    Check delivery for many (product_id, pincode) pairs concurrently.
+    Results come back in the same order as pairs; a failed check counts as None.
+    Without a semaphore, all calls on the event loop share one CONFIG.max_delivery_workers cap.
+    Products with several pincodes are first tried as one multi-pincode request.
+    """
+    if semaphore is None:
+        semaphore = _default_semaphore()
+    
+    known = {}
+    if _edd_batch_usable():
+        by_product: Dict[str, List[str]] = {}
+        for product_id, pincode in pairs:
+            by_product.setdefault(product_id, []).append(pincode)
+        multi = {product_id: pincodes for product_id, pincodes in by_product.items() if len(pincodes) > 1}
+        answers = await asyncio.gather(
+            *(_run_bounded(semaphore, _check_delivery_multi, product_id, pincodes, user_cookies)
+              for product_id, pincodes in multi.items()),
+            return_exceptions=True
+        )
+        for product_id, answer in zip(multi, answers):
+            if isinstance(answer, dict):
+                known.update(((product_id, pincode), verdict) for pincode, verdict in answer.items())
+    
+    remaining = list(dict.fromkeys(pair for pair in pairs if pair not in known))
+    results = await asyncio.gather(
+        *(_run_bounded(semaphore, check_delivery_via_api, product_id, pincode, user_cookies)
+          for product_id, pincode in remaining),
+        return_exceptions=True
+    )
+    known.update((pair, None if isinstance(r, BaseException) else r) for pair, r in zip(remaining, results))
+    return [known[pair] for pair in pairs]
+
+
+async def check_carts_batch(product_ids: List[str], user_cookies: str = None,
+                            semaphore: asyncio.Semaphore = None) -> List[Optional[bool]]:
+    """
+    Check cart availability for many products concurrently, in the same order as product_ids.
+    """
+    if semaphore is None:
+        semaphore = _default_semaphore()
+    
+    results = await asyncio.gather(
+        *(_run_bounded(semaphore, check_availability_via_cart, product_id, user_cookies)
+          for product_id in product_ids),
+        return_exceptions=True
+    )
+    return [None if isinstance(r, BaseException) else r for r in results]
+
+
+async def fetch_all_products(filtered_url: str, user_cookies: str = None, max_products: int = None,
+                             semaphore: asyncio.Semaphore = None) -> List[Dict[str, Any]]:
+    """
+    Fetch a listing across pages: page 0 first to learn the page count, then the
+    remaining pages concurrently. Stops at max_products (all pages if None).
+    Products are de-duplicated by code and keep page order.
+    """
+    if semaphore is None:
+        semaphore = _default_semaphore()
+    
+    async with semaphore:
+        first_page, total_pages = await asyncio.to_thread(_fetch_products_page, filtered_url, user_cookies, 0)
+    
+    if max_products is not None:
+        total_pages = min(total_pages, -(-max_products // PAGE_SIZE))
+    
+    pages = await asyncio.gather(
+        *(_run_bounded(semaphore, _fetch_products_page, filtered_url, user_cookies, page)
+          for page in range(1, total_pages)),
+        return_exceptions=True
+    )
+    
+    products = []
+    seen_codes = set()
+    for page_products in [first_page, *(p[0] for p in pages if not isinstance(p, BaseException))]:
+        for product in page_products:
+            if product['code'] not in seen_codes:
+                seen_codes.add(product['code'])
+                products.append(product)
+    
+    return products if max_products is None else products[:max_products]
+
+
+def fetch_all_products_sync(filtered_url: str, user_cookies: str = None, max_products: int = None) -> List[Dict[str, Any]]:
+    """Blocking wrapper around fetch_all_products for code without an event loop."""
+    return asyncio.run(fetch_all_products(filtered_url, user_cookies, max_products))
+
+
+def check_deliveries(pairs: List[tuple], user_cookies: str = None) -> List[Optional[bool]]:
+    """Blocking wrapper around check_deliveries_batch for code without an event loop."""
+    return asyncio.run(check_deliveries_batch(pairs, user_cookies))
+
+
+def check_deliveries_multi(product_id: str, pincodes: List[str], user_cookies: str = None) -> Dict[str, Optional[bool]]:
+    """Check every pincode for one product, in one request when the API allows. Returns {pincode: result}."""
+    return dict(zip(pincodes, check_deliveries([(product_id, pincode) for pincode in pincodes], user_cookies)))
+
+
+def check_carts(product_ids: List[str], user_cookies: str = None) -> List[Optional[bool]]:
+    """Blocking wrapper around check_carts_batch for code without an event loop."""
+    return asyncio.run(check_carts_batch(product_ids, user_cookies))
+
+
 class SheinScraper:
     """SHEIN product availability scraper using API-only methods."""
     
@@ -553,9 +914,14 @@ class SheinScraper:
         """Set callback function to be called when new product is found."""
         self.new_product_callback = callback
     
-    def fetch_products_api(self, filtered_url: str, user_cookies: str = None) -> List[Dict[str, Any]]:
-        """Fetch products via SHEIN API."""
-        return fetch_products_api(filtered_url, user_cookies)
+    def fetch_products_api(self, filtered_url: str, user_cookies: str = None, page: int = 0) -> List[Dict[str, Any]]:
+        """Fetch one page of products via SHEIN API."""
+        return fetch_products_api(filtered_url, user_cookies, page)
+    
+    async def fetch_all_products(self, filtered_url: str, user_cookies: str = None, max_products: int = None,
+                                 semaphore: asyncio.Semaphore = None) -> List[Dict[str, Any]]:
+        """Fetch a listing's pages concurrently via SHEIN API."""
+        return await fetch_all_products(filtered_url, user_cookies, max_products, semaphore)
     
     def check_delivery_via_api(self, product_id: str, pincode: str, user_cookies: str = None) -> Optional[bool]:
         """Check delivery via SHEIN India API."""
@@ -565,6 +931,16 @@ class SheinScraper:
         """Check product availability using cart API."""
         return check_availability_via_cart(product_id, user_cookies)
     
+    async def check_deliveries_batch(self, pairs: List[tuple], user_cookies: str = None,
+                                     semaphore: asyncio.Semaphore = None) -> List[Optional[bool]]:
+        """Check delivery for many (product_id, pincode) pairs concurrently."""
+        return await check_deliveries_batch(pairs, user_cookies, semaphore)
+    
+    async def check_carts_batch(self, product_ids: List[str], user_cookies: str = None,
+                                semaphore: asyncio.Semaphore = None) -> List[Optional[bool]]:
+        """Check cart availability for many products concurrently."""
+        return await check_carts_batch(product_ids, user_cookies, semaphore)
+    
     def api_login_request_otp(self, phone_number: str) -> Dict[str, Any]:
         """Request OTP via SHEIN API."""
         return api_login_request_otp(phone_number)
@@ -602,7 +978,9 @@ def set_new_product_callback(callback):
 
 
 def cleanup_scraper() -> None:
-    """Clean up the global scraper instance."""
+    """Clean up the global scraper instance and drop cached API responses."""
     global _scraper_instance, _new_product_callback
     _scraper_instance = None
     _new_product_callback = None
+    _PRODUCTS_CACHE.clear()
+    _DELIVERY_CACHE.clear()
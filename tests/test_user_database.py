@@ -0,0 +1,77 @@
+"""Tests for the per-user JSON store in user_database."""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_database
+
+
+class UserTransactionThreadTest(unittest.TestCase):
+    """user_transaction() must keep overlapping threads on the same user apart."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        user_database.DATA_DIR = self._tmp.name
+        user_database.SEEN_DB_PATH = os.path.join(self._tmp.name, "seen_products.db")
+        user_database.invalidate_user_cache()
+
+    def tearDown(self):
+        user_database.flush_all()
+        user_database.invalidate_user_cache()
+        self._tmp.cleanup()
+
+    def test_overlapping_transactions_on_same_user(self):
+        user_id = "2"
+        user_database.load_user_data(user_id)
+        first_inside = threading.Event()
+        errors = []
+
+        def failing_batch():
+            try:
+                with user_database.user_transaction(user_id):
+                    user_database.add_user_url(user_id, "https://example.com/rolled-back")
+                    first_inside.set()
+                    time.sleep(0.2)
+                    raise RuntimeError("abort batch")
+            except RuntimeError:
+                pass
+            except Exception as e:
+                errors.append(e)
+
+        def committing_batch():
+            first_inside.wait()
+            try:
+                with user_database.user_transaction(user_id):
+                    user_database.add_user_url(user_id, "https://example.com/kept")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=failing_batch), threading.Thread(target=committing_batch)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive(), "transaction threads deadlocked")
+
+        self.assertEqual(errors, [])
+        self.assertNotIn(user_id, user_database._TXN_DEPTH)
+        self.assertNotIn(user_id, user_database._BATCHES)
+
+        user_database.flush_all()
+        user_database.invalidate_user_cache(user_id)
+        self.assertEqual(user_database.get_user_urls(user_id), ("https://example.com/kept",))
+
+        # Batching still works afterwards: nothing reaches disk before the block ends
+        with user_database.user_transaction(user_id):
+            user_database.add_user_url(user_id, "https://example.com/later")
+            self.assertNotIn(user_id, user_database._DIRTY)
+        self.assertIn(user_id, user_database._DIRTY)
+
+
+if __name__ == "__main__":
+    unittest.main()
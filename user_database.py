@@ -3,13 +3,119 @@ Per-User JSON Database Module for SHEIN Verse Product Monitor.
 
 Handles separate storage per user with full isolation.
 Each user gets their own JSON file: data/user_{userId}.json
+Seen products live in a per-user SQLite table: data/seen_products.db
 """
 import os
 import json
+import mmap
+import logging
+import time
+import atexit
+import sqlite3
+import threading
+import concurrent.futures
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, FrozenSet, Tuple
+
+log = logging.getLogger("USER_DB")
 
 DATA_DIR = "./data"
+SEEN_DB_PATH = os.path.join(DATA_DIR, "seen_products.db")
+
+_SEEN_CONN: Optional[sqlite3.Connection] = None
+_SEEN_LOCK = threading.Lock()
+# Newest seen products kept per user; older rows are trimmed as new ones are inserted
+MAX_SEEN_PRODUCTS = 500
+# Seen-product row counts per user, counted on first insert and kept in step with writes
+_SEEN_COUNTS: Dict[str, int] = {}
+# Trims run PRAGMA optimize at most this often, so query planner stats follow the deletes
+SEEN_OPTIMIZE_INTERVAL_SECONDS = 3600
+_SEEN_OPTIMIZED_AT: Optional[float] = None
+
+# Parsed user files are kept in memory; saves write through to the cache
+CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '300'))
+_USER_CACHE: Dict[str, Dict[str, Any]] = {}
+_USER_CACHE_LOADED_AT: Dict[str, float] = {}
+
+# Bumped when the user file layout changes; older files are upgraded once on load
+SCHEMA_VERSION = 2
+
+# Users inside begin()/commit(); their saves stay in memory until commit
+_BATCHES: Dict[str, Dict[str, Any]] = {}
+# Nesting depth of user_transaction() per user
+_TXN_DEPTH: Dict[str, int] = {}
+
+# Files are written compactly; USER_DB_PRETTY=1 indents them for hand-editing
+PRETTY = os.environ.get('USER_DB_PRETTY') == '1'
+
+@dataclass(slots=True)
+class Delivery:
+    """A deliverable (product, pincode) pair recorded for a user. Stored as a dict in the JSON file."""
+    product_url: str
+    pincode: str
+    first_found: str
+    last_checked: str
+    notified: bool = False
+    
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Delivery":
+        return cls(d["product_url"], d["pincode"], d.get("first_found", ""), d.get("last_checked", ""), d.get("notified", False))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "product_url": self.product_url,
+            "pincode": self.pincode,
+            "first_found": self.first_found,
+            "last_checked": self.last_checked,
+            "notified": self.notified
+        }
+
+
+# orjson encodes and decodes user files several times faster; fall back to json without it.
+# orjson serializes Delivery dataclasses natively; json goes through to_dict().
+try:
+    import orjson
+    _loads = orjson.loads
+    # orjson parses straight from a memoryview, so large files can be mapped instead of copied
+    _LOADS_BUFFER = True
+    
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 if PRETTY else 0)
+except ImportError:
+    _loads = json.loads
+    _LOADS_BUFFER = False
+    
+    def _json_default(obj: Any) -> Any:
+        return obj.to_dict() if isinstance(obj, Delivery) else str(obj)
+    
+    def _dumps(obj: Any) -> bytes:
+        if PRETTY:
+            return json.dumps(obj, indent=2, default=_json_default).encode()
+        return json.dumps(obj, separators=(',', ':'), default=_json_default).encode()
+
+# Saves only mark a user dirty; a timer writes dirty users FLUSH_DELAY_SECONDS later,
+# so a burst of changes costs one file write
+FLUSH_DELAY_SECONDS = 0.5
+_DIRTY: Set[str] = set()
+_LOCK = threading.RLock()
+_FLUSH_LOCK = threading.Lock()
+_FLUSH_TIMER: Optional[threading.Timer] = None
+
+# One lock per user, so handlers for different users never wait on each other
+_USER_LOCKS: Dict[str, threading.RLock] = {}
+_LOCKS_LOCK = threading.Lock()
+
+
+def _get_lock(user_id: str) -> threading.RLock:
+    """Return the lock guarding a user's data, creating it on first use."""
+    lock = _USER_LOCKS.get(user_id)
+    if lock is None:
+        with _LOCKS_LOCK:
+            lock = _USER_LOCKS.setdefault(user_id, threading.RLock())
+    return lock
+
 
 def _load_authorized_users() -> List[str]:
     """Load authorized users from environment variable or use defaults."""
@@ -19,26 +125,52 @@ def _load_authorized_users() -> List[str]:
     return ["7194175926", "1950577113"]
 
 AUTHORIZED_USERS = _load_authorized_users()
+# Checked on every incoming Telegram update
+_AUTHORIZED_SET: FrozenSet[str] = frozenset(AUTHORIZED_USERS)
+# Handed out as-is by get_all_authorized_users; immutable, so no copy is needed
+_AUTHORIZED_TUPLE: Tuple[str, ...] = tuple(AUTHORIZED_USERS)
+
+
+def reload_authorized_users() -> None:
+    """Re-read the authorized users list and rebuild the membership set."""
+    global AUTHORIZED_USERS, _AUTHORIZED_SET, _AUTHORIZED_TUPLE
+    AUTHORIZED_USERS = _load_authorized_users()
+    _AUTHORIZED_SET = frozenset(AUTHORIZED_USERS)
+    _AUTHORIZED_TUPLE = tuple(AUTHORIZED_USERS)
+
+
+# Scalar defaults for a new user; mutable fields are created fresh per user
+_DEFAULT_TEMPLATE: Dict[str, Any] = {
+    "authCookies": None,
+    "lastKnownStock": 0,
+    "lastCheckedTimestamp": None,
+    "schemaVersion": SCHEMA_VERSION
+}
+
 
 def get_default_user_data(user_id: str) -> Dict[str, Any]:
     """Return default structure for a new user."""
     return {
         "userId": user_id,
+        **_DEFAULT_TEMPLATE,
         "monitorUrls": [],
         "pincodes": [],
-        "authCookies": None,
-        "lastKnownStock": 0,
-        "lastCheckedTimestamp": None,
-        "seenProducts": [],
         "deliveries": [],
         "settings": {}
     }
 
 
+# DATA_DIR once it is known to exist, so later calls skip the filesystem
+_DATA_DIR_READY: Optional[str] = None
+
+
 def ensure_data_dir() -> None:
     """Ensure the data directory exists."""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
+    global _DATA_DIR_READY
+    if _DATA_DIR_READY == DATA_DIR:
+        return
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _DATA_DIR_READY = DATA_DIR
 
 
 def get_user_file_path(user_id: str) -> str:
@@ -46,89 +178,274 @@ def get_user_file_path(user_id: str) -> str:
     return os.path.join(DATA_DIR, f"user_{user_id}.json")
 
 
-def load_user_data(user_id: str) -> Dict[str, Any]:
-    """Load user data from their JSON file. Creates default if not exists."""
-    ensure_data_dir()
-    file_path = get_user_file_path(user_id)
+def _cache_user_data(user_id: str, data: Dict[str, Any]) -> None:
+    """Store parsed user data in the in-memory cache."""
+    _USER_CACHE[user_id] = data
+    _USER_CACHE_LOADED_AT[user_id] = time.monotonic()
+
+
+def invalidate_user_cache(user_id: Optional[str] = None) -> None:
+    """Drop cached data for a user (or all users) so the next load reads from disk."""
+    # Unsaved changes are written first so they are not lost with the cache entry
+    if _DIRTY and (user_id is None or user_id in _DIRTY):
+        flush_all()
     
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                if "pincodes" not in data:
-                    data["pincodes"] = []
-                if "seenProducts" not in data:
-                    data["seenProducts"] = []
-                if "deliveries" not in data:
-                    data["deliveries"] = []
-                if "settings" not in data:
-                    data["settings"] = {}
-                if "monitorUrls" not in data:
-                    old_url = data.get("monitorUrl")
-                    data["monitorUrls"] = [old_url] if old_url else []
-                    if "monitorUrl" in data:
-                        del data["monitorUrl"]
+    with _LOCK:
+        if user_id is None:
+            _USER_CACHE.clear()
+            _USER_CACHE_LOADED_AT.clear()
+        else:
+            _USER_CACHE.pop(user_id, None)
+            _USER_CACHE_LOADED_AT.pop(user_id, None)
+
+
+def _upgrade_user_data(user_id: str, data: Dict[str, Any]) -> None:
+    """Bring a file written by an older version up to SCHEMA_VERSION and save it."""
+    data.setdefault("pincodes", [])
+    data.setdefault("deliveries", [])
+    data.setdefault("settings", {})
+    if "monitorUrls" not in data:
+        old_url = data.pop("monitorUrl", None)
+        data["monitorUrls"] = [old_url] if old_url else []
+    if "seenProducts" in data:
+        _migrate_seen_products(user_id, data)
+    data["schemaVersion"] = SCHEMA_VERSION
+    save_user_data(user_id, data)
+
+
+# Below this size a plain read is cheaper than setting up a mapping
+MMAP_MIN_BYTES = 64 * 1024
+
+
+def _read_user_file(file_path: str) -> Dict[str, Any]:
+    """Parse a user's JSON file. Large files are memory-mapped rather than read into a bytes copy."""
+    with open(file_path, 'rb') as f:
+        if _LOADS_BUFFER and os.fstat(f.fileno()).st_size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return _loads(view)
+        return _loads(f.read())
+
+
+def load_user_data(user_id: str) -> Dict[str, Any]:
+    """Load user data from cache or their JSON file. Creates default if not exists."""
+    with _get_lock(user_id):
+        if user_id in _BATCHES:
+            return _BATCHES[user_id]
+        
+        cached = _USER_CACHE.get(user_id)
+        if cached is not None and (user_id in _DIRTY or time.monotonic() - _USER_CACHE_LOADED_AT[user_id] < CACHE_TTL_SECONDS):
+            return cached
+        
+        ensure_data_dir()
+        file_path = get_user_file_path(user_id)
+        
+        if os.path.exists(file_path):
+            try:
+                data = _read_user_file(file_path)
+                if data.get("schemaVersion", 0) < SCHEMA_VERSION:
+                    _upgrade_user_data(user_id, data)
+                data["deliveries"] = [Delivery.from_dict(d) for d in data.get("deliveries", ())]
+                _cache_user_data(user_id, data)
                 return data
-        except json.JSONDecodeError:
-            print(f"[USER_DB] Error reading {file_path}, creating new")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Unparseable JSON or a malformed record (e.g. a delivery missing its keys)
+                log.error("Error reading %s, creating new: %r", file_path, e)
+        
+        default_data = get_default_user_data(user_id)
+        save_user_data(user_id, default_data)
+        return default_data
+
+
+def warm_cache() -> Dict[str, Dict[str, Any]]:
+    """Load every authorized user's data into the cache in parallel. Returns the loaded data."""
+    users = get_all_authorized_users()
+    if not users:
+        return {}
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(users))) as executor:
+        loaded = list(executor.map(load_user_data, users))
     
-    default_data = get_default_user_data(user_id)
-    save_user_data(user_id, default_data)
-    return default_data
+    _get_seen_conn()
+    return dict(zip(users, loaded))
 
 
 def save_user_data(user_id: str, data: Dict[str, Any]) -> bool:
-    """Save user data to their JSON file."""
+    """Update the cache and queue the user's JSON file to be written shortly."""
+    global _FLUSH_TIMER
+    
+    with _LOCK:
+        _cache_user_data(user_id, data)
+        if user_id in _BATCHES:
+            _BATCHES[user_id] = data
+            return True
+        
+        _DIRTY.add(user_id)
+        if _FLUSH_TIMER is None:
+            _FLUSH_TIMER = threading.Timer(FLUSH_DELAY_SECONDS, flush_all)
+            _FLUSH_TIMER.daemon = True
+            _FLUSH_TIMER.start()
+    return True
+
+
+def flush_all() -> None:
+    """Write every user with unsaved changes to disk. Also runs at interpreter exit."""
+    global _FLUSH_TIMER
+    
+    # Held for the whole flush so an exit-time flush waits for the timer's writes
+    with _FLUSH_LOCK:
+        with _LOCK:
+            if _FLUSH_TIMER is not None:
+                _FLUSH_TIMER.cancel()
+                _FLUSH_TIMER = None
+            pending = list(_DIRTY)
+        
+        for user_id in pending:
+            _flush_user(user_id)
+
+
+def _flush_user(user_id: str) -> None:
+    """
+    Write one user's file if it has unsaved changes.
+    The user's lock keeps a mutator or open transaction from changing the data mid-serialization,
+    and the dirty mark is only cleared under it, so begin() and flush_all() never both skip a write.
+    """
+    with _get_lock(user_id):
+        with _LOCK:
+            if user_id not in _DIRTY:
+                return
+            _DIRTY.discard(user_id)
+            data = _USER_CACHE.get(user_id)
+        
+        if data is not None and not _write_user_file(user_id, data):
+            # Keep it dirty; the next save schedules another attempt
+            with _LOCK:
+                _DIRTY.add(user_id)
+
+
+atexit.register(flush_all)
+
+
+def _write_user_file(user_id: str, data: Dict[str, Any]) -> bool:
+    """Write user data to disk atomically: a temp file is synced, then renamed over the old one."""
     ensure_data_dir()
     file_path = get_user_file_path(user_id)
+    tmp_path = file_path + ".tmp"
     
     try:
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        # Underscore keys are in-memory indexes and never reach the file
+        payload = _dumps({k: v for k, v in data.items() if not k.startswith('_')})
+        # Unbuffered: the whole payload goes out in one write() instead of buffer-sized chunks
+        with open(tmp_path, 'wb', buffering=0) as f:
+            view = memoryview(payload)
+            while view:
+                view = view[f.write(view):]
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
         return True
     except Exception as e:
-        print(f"[USER_DB] Error saving {file_path}: {e}")
+        log.error("Error saving %s: %s", file_path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def begin(user_id: str) -> None:
+    """Start batching a user's saves; nothing is written to disk until commit()."""
+    data = load_user_data(user_id)
+    # Earlier changes (including a freshly created file) go to disk first,
+    # so rollback() only discards the batch
+    _flush_user(user_id)
+    _BATCHES[user_id] = data
+
+
+def commit(user_id: str) -> bool:
+    """Save the batched data for a user as a single write."""
+    data = _BATCHES.pop(user_id, None)
+    if data is None:
         return False
+    return save_user_data(user_id, data)
+
+
+def rollback(user_id: str) -> None:
+    """Discard batched changes for a user and reload from disk on next access."""
+    # Batched saves never mark the user dirty, so there is nothing to flush first
+    with _LOCK:
+        _BATCHES.pop(user_id, None)
+        _USER_CACHE.pop(user_id, None)
+        _USER_CACHE_LOADED_AT.pop(user_id, None)
+
+
+@contextmanager
+def user_transaction(user_id: str):
+    """
+    Group a burst of changes to one user into a single save.
+    Nested blocks join the outermost one; an exception discards the whole batch.
+    The user's lock is held for the whole block, so other threads touching this user
+    wait for it to finish; keep the block short and free of awaits.
+    """
+    with _get_lock(user_id):
+        depth = _TXN_DEPTH.get(user_id, 0)
+        if depth == 0:
+            begin(user_id)
+        _TXN_DEPTH[user_id] = depth + 1
+        try:
+            yield
+        except BaseException:
+            if depth == 0:
+                rollback(user_id)
+            raise
+        else:
+            if depth == 0:
+                commit(user_id)
+        finally:
+            if depth == 0:
+                _TXN_DEPTH.pop(user_id, None)
+            else:
+                _TXN_DEPTH[user_id] = depth
 
 
 def is_authorized_user(user_id: str) -> bool:
     """Check if a user is in the authorized list."""
-    return str(user_id) in AUTHORIZED_USERS
+    return str(user_id) in _AUTHORIZED_SET
 
 
-def get_all_authorized_users() -> List[str]:
-    """Get list of all authorized user IDs."""
-    return AUTHORIZED_USERS.copy()
+def get_all_authorized_users() -> Tuple[str, ...]:
+    """Get all authorized user IDs."""
+    return _AUTHORIZED_TUPLE
 
 
-def get_user_urls(user_id: str) -> List[str]:
-    """Get all monitor URLs for a user."""
+def get_user_urls(user_id: str) -> Tuple[str, ...]:
+    """Get all monitor URLs for a user, as a tuple so the cached list can't be changed by callers."""
     data = load_user_data(user_id)
-    return data.get("monitorUrls", [])
+    return tuple(data.get("monitorUrls", ()))
 
 
 def add_user_url(user_id: str, url: str) -> bool:
     """Add a monitor URL for a user. Returns True if added, False if already exists."""
-    data = load_user_data(user_id)
-    urls = data.get("monitorUrls", [])
-    if url not in urls:
-        urls.append(url)
-        data["monitorUrls"] = urls
-        save_user_data(user_id, data)
-        return True
-    return False
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        urls = data.get("monitorUrls", [])
+        if url not in urls:
+            urls.append(url)
+            data["monitorUrls"] = urls
+            save_user_data(user_id, data)
+            return True
+        return False
 
 
 def remove_user_url(user_id: str, url_index: int) -> Optional[str]:
     """Remove a monitor URL by index. Returns the removed URL or None."""
-    data = load_user_data(user_id)
-    urls = data.get("monitorUrls", [])
-    if 0 <= url_index < len(urls):
-        removed = urls.pop(url_index)
-        data["monitorUrls"] = urls
-        save_user_data(user_id, data)
-        return removed
-    return None
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        urls = data.get("monitorUrls", [])
+        if 0 <= url_index < len(urls):
+            removed = urls.pop(url_index)
+            data["monitorUrls"] = urls
+            save_user_data(user_id, data)
+            return removed
+        return None
 
 
 def get_auth_cookies(user_id: str) -> Optional[str]:
@@ -139,150 +456,349 @@ def get_auth_cookies(user_id: str) -> Optional[str]:
 
 def set_auth_cookies(user_id: str, cookies: str) -> bool:
     """Set auth cookies for a user."""
-    data = load_user_data(user_id)
-    data["authCookies"] = cookies
-    return save_user_data(user_id, data)
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        if data.get("authCookies") == cookies:
+            return True
+        data["authCookies"] = cookies
+        return save_user_data(user_id, data)
 
 
-def get_user_pincodes(user_id: str) -> List[str]:
-    """Get all pincodes for a user."""
+def get_user_pincodes(user_id: str) -> Tuple[str, ...]:
+    """Get all pincodes for a user, as a tuple so the cached list can't be changed by callers."""
     data = load_user_data(user_id)
-    return data.get("pincodes", [])
+    return tuple(data.get("pincodes", ()))
+
+
+def _pin_set(data: Dict[str, Any]) -> set:
+    """Set view of data["pincodes"], built on first use and kept in the cached data."""
+    pins = data.get("_pinSet")
+    if pins is None:
+        pins = data["_pinSet"] = set(data.get("pincodes", []))
+    return pins
 
 
 def add_user_pincodes(user_id: str, pincodes: List[str]) -> List[str]:
-    """Add pincodes for a user. Returns list of newly added pincodes."""
-    data = load_user_data(user_id)
-    existing = set(data.get("pincodes", []))
-    added = []
-    
-    for p in pincodes:
-        if p not in existing:
-            existing.add(p)
-            added.append(p)
-    
-    data["pincodes"] = sorted(list(existing))
-    save_user_data(user_id, data)
-    return added
+    """Add pincodes for a user. Returns the newly added pincodes, sorted."""
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        existing = _pin_set(data)
+        added = sorted(set(pincodes) - existing)
+        
+        if added:
+            existing.update(added)
+            data["pincodes"] = sorted(existing)
+            save_user_data(user_id, data)
+        return added
 
 
 def remove_user_pincodes(user_id: str, pincodes: List[str]) -> List[str]:
-    """Remove pincodes for a user. Returns list of removed pincodes."""
-    data = load_user_data(user_id)
-    existing = set(data.get("pincodes", []))
-    removed = []
-    
-    for p in pincodes:
-        if p in existing:
-            existing.remove(p)
-            removed.append(p)
-    
-    data["pincodes"] = sorted(list(existing))
-    save_user_data(user_id, data)
-    return removed
+    """Remove pincodes for a user. Returns the removed pincodes, sorted."""
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        existing = _pin_set(data)
+        removed = sorted(existing.intersection(pincodes))
+        
+        if removed:
+            existing.difference_update(removed)
+            data["pincodes"] = sorted(existing)
+            save_user_data(user_id, data)
+        return removed
 
 
-def get_user_auth_cookies(user_id: str) -> Optional[str]:
-    """Get auth cookies for a user."""
-    data = load_user_data(user_id)
-    return data.get("authCookies")
+# Older names kept for existing callers
+get_user_auth_cookies = get_auth_cookies
+set_user_auth_cookies = set_auth_cookies
 
 
-def set_user_auth_cookies(user_id: str, cookies: str) -> bool:
-    """Set auth cookies for a user."""
-    data = load_user_data(user_id)
-    data["authCookies"] = cookies
-    return save_user_data(user_id, data)
+def _get_seen_conn() -> sqlite3.Connection:
+    """Get the shared seen-products connection, creating the table on first use."""
+    global _SEEN_CONN
+    
+    if _SEEN_CONN is None:
+        ensure_data_dir()
+        conn = sqlite3.connect(SEEN_DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_products (
+                user_id TEXT NOT NULL,
+                product_url TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (user_id, product_url)
+            )
+        """)
+        # Lets cleanup_user_old_entries walk one user's rows newest-first without sorting
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_user_time ON seen_products(user_id, seen_at)")
+        conn.commit()
+        _SEEN_CONN = conn
+    
+    return _SEEN_CONN
+
+
+def _migrate_seen_products(user_id: str, data: Dict[str, Any]) -> None:
+    """Move a legacy seenProducts list from the JSON file into SQLite."""
+    bulk_mark_products_seen(user_id, data.pop("seenProducts") or [])
+    log.info("Migrated seen products for %s to SQLite", user_id)
+
+
+def _delete_oldest_seen(conn: sqlite3.Connection, user_id: str, keep: int) -> int:
+    """Delete all but the newest keep seen products of a user. Returns how many were removed."""
+    cursor = conn.execute("""
+        DELETE FROM seen_products
+        WHERE user_id = ? AND rowid NOT IN (
+            SELECT rowid FROM seen_products
+            WHERE user_id = ?
+            ORDER BY seen_at DESC, rowid DESC
+            LIMIT ?
+        )
+    """, (user_id, user_id, keep))
+    return cursor.rowcount
+
+
+def _after_seen_insert(conn: sqlite3.Connection, user_id: str, inserted: int) -> bool:
+    """
+    Track a user's seen count and trim past MAX_SEEN_PRODUCTS. Caller holds _SEEN_LOCK.
+    Returns True if rows were trimmed.
+    """
+    count = _SEEN_COUNTS.get(user_id)
+    if count is None:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM seen_products WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+    else:
+        count += inserted
+    
+    removed = _delete_oldest_seen(conn, user_id, MAX_SEEN_PRODUCTS) if count > MAX_SEEN_PRODUCTS else 0
+    _SEEN_COUNTS[user_id] = count - removed
+    return removed > 0
+
+
+def _optimize_seen_after_trim(conn: sqlite3.Connection) -> None:
+    """Run PRAGMA optimize after a committed trim, at most once per interval. Caller holds _SEEN_LOCK."""
+    global _SEEN_OPTIMIZED_AT
+    now = time.monotonic()
+    if _SEEN_OPTIMIZED_AT is None or now - _SEEN_OPTIMIZED_AT >= SEEN_OPTIMIZE_INTERVAL_SECONDS:
+        _SEEN_OPTIMIZED_AT = now
+        conn.execute("PRAGMA optimize")
 
 
 def mark_product_seen(user_id: str, product_url: str) -> None:
     """Mark a product as seen for a user."""
-    data = load_user_data(user_id)
-    seen = data.get("seenProducts", [])
-    if product_url not in seen:
-        seen.append(product_url)
-        data["seenProducts"] = seen
-        save_user_data(user_id, data)
+    with _SEEN_LOCK:
+        conn = _get_seen_conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO seen_products (user_id, product_url, seen_at) VALUES (?, ?, ?)",
+            (user_id, product_url, time.time())
+        )
+        trimmed = cursor.rowcount > 0 and _after_seen_insert(conn, user_id, cursor.rowcount)
+        conn.commit()
+        if trimmed:
+            _optimize_seen_after_trim(conn)
+
+
+def get_seen_products(user_id: str) -> set:
+    """Get the seen products of a user as a set for fast membership tests."""
+    with _SEEN_LOCK:
+        rows = _get_seen_conn().execute(
+            "SELECT product_url FROM seen_products WHERE user_id = ?", (user_id,)
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def bulk_mark_products_seen(user_id: str, product_urls: List[str]) -> None:
+    """Mark several products as seen for a user in a single transaction."""
+    if not product_urls:
+        return
+    
+    now = time.time()
+    with _SEEN_LOCK:
+        conn = _get_seen_conn()
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO seen_products (user_id, product_url, seen_at) VALUES (?, ?, ?)",
+            [(user_id, product_url, now) for product_url in product_urls]
+        )
+        trimmed = cursor.rowcount > 0 and _after_seen_insert(conn, user_id, cursor.rowcount)
+        conn.commit()
+        if trimmed:
+            _optimize_seen_after_trim(conn)
 
 
 def is_product_seen(user_id: str, product_url: str) -> bool:
     """Check if a product has been seen by a user."""
-    data = load_user_data(user_id)
-    return product_url in data.get("seenProducts", [])
+    with _SEEN_LOCK:
+        row = _get_seen_conn().execute(
+            "SELECT 1 FROM seen_products WHERE user_id = ? AND product_url = ?",
+            (user_id, product_url)
+        ).fetchone()
+    return row is not None
+
+
+def filter_unseen(user_id: str, product_urls: List[str]) -> List[str]:
+    """
+    Return the product URLs a user has not seen yet, keeping their order.
+    Looks them up with one query per 500 URLs instead of one per product.
+    """
+    seen = set()
+    with _SEEN_LOCK:
+        conn = _get_seen_conn()
+        for start in range(0, len(product_urls), 500):
+            chunk = product_urls[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            seen.update(row[0] for row in conn.execute(
+                f"SELECT product_url FROM seen_products WHERE user_id = ? AND product_url IN ({placeholders})",
+                (user_id, *chunk)
+            ))
+    return [product_url for product_url in product_urls if product_url not in seen]
+
+
+def count_seen_products(user_id: str) -> int:
+    """Get the number of products a user has seen."""
+    with _SEEN_LOCK:
+        count = _SEEN_COUNTS.get(user_id)
+        if count is None:
+            count = _SEEN_COUNTS[user_id] = _get_seen_conn().execute(
+                "SELECT COUNT(*) FROM seen_products WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+    return count
+
+
+def clear_seen_products(user_id: str) -> int:
+    """Forget all seen products for a user. Returns how many were removed."""
+    with _SEEN_LOCK:
+        conn = _get_seen_conn()
+        cursor = conn.execute("DELETE FROM seen_products WHERE user_id = ?", (user_id,))
+        conn.commit()
+        _SEEN_COUNTS[user_id] = 0
+    return cursor.rowcount
+
+
+def _delivery_index(data: Dict[str, Any]) -> Dict[tuple, Delivery]:
+    """
+    Map (product_url, pincode) to its entry in data["deliveries"], built on first use.
+    Values are the same objects as in the list, so updating one updates both.
+    """
+    index = data.get("_deliveryIndex")
+    if index is None:
+        index = data["_deliveryIndex"] = {(d.product_url, d.pincode): d for d in data.setdefault("deliveries", [])}
+    return index
+
+
+def _pending_queue(data: Dict[str, Any]) -> List[Delivery]:
+    """Unnotified deliveries in insertion order, collected on first use and appended to on insert."""
+    queue = data.get("_pendingQueue")
+    if queue is None:
+        queue = data["_pendingQueue"] = [d for d in data.get("deliveries", ()) if not d.notified]
+    return queue
 
 
 def save_delivery_result(user_id: str, product_url: str, pincode: str) -> bool:
     """Save a deliverable result for a user. Returns True if new."""
-    data = load_user_data(user_id)
-    deliveries = data.get("deliveries", [])
-    
-    for d in deliveries:
-        if d["product_url"] == product_url and d["pincode"] == pincode:
-            d["last_checked"] = datetime.now().isoformat()
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        index = _delivery_index(data)
+        now = datetime.now().isoformat()
+        
+        existing = index.get((product_url, pincode))
+        if existing:
+            existing.last_checked = now
             save_user_data(user_id, data)
             return False
+        
+        # Built before the append so the new entry is queued exactly once
+        pending = _pending_queue(data)
+        entry = Delivery(product_url, pincode, now, now)
+        data["deliveries"].append(entry)
+        index[(product_url, pincode)] = entry
+        pending.append(entry)
+        save_user_data(user_id, data)
+        return True
+
+
+def bulk_save_delivery_results(user_id: str, results: List[tuple]) -> List[tuple]:
+    """
+    Save several (product_url, pincode) deliverable results with a single save.
+    Returns the list of results that were new.
+    """
+    if not results:
+        return []
     
-    deliveries.append({
-        "product_url": product_url,
-        "pincode": pincode,
-        "first_found": datetime.now().isoformat(),
-        "last_checked": datetime.now().isoformat(),
-        "notified": False
-    })
-    data["deliveries"] = deliveries
-    save_user_data(user_id, data)
-    return True
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        index = _delivery_index(data)
+        deliveries = data["deliveries"]
+        pending = _pending_queue(data)
+        now = datetime.now().isoformat()
+        added = []
+        
+        for product_url, pincode in results:
+            existing = index.get((product_url, pincode))
+            if existing:
+                existing.last_checked = now
+                continue
+            
+            entry = Delivery(product_url, pincode, now, now)
+            deliveries.append(entry)
+            index[(product_url, pincode)] = entry
+            pending.append(entry)
+            added.append((product_url, pincode))
+        
+        save_user_data(user_id, data)
+        return added
+
+
+def get_delivery_keys(user_id: str) -> set:
+    """Get the set of (product_url, pincode) pairs already recorded for a user."""
+    return set(_delivery_index(load_user_data(user_id)))
 
 
 def get_user_new_deliverables(user_id: str) -> List[tuple]:
     """Get unnotified deliverables for a user. Returns list of (product_url, pincode)."""
-    data = load_user_data(user_id)
-    deliveries = data.get("deliveries", [])
-    result = []
-    
-    for d in deliveries:
-        if not d.get("notified", False):
-            result.append((d["product_url"], d["pincode"]))
-            d["notified"] = True
-    
-    if result:
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        queue = _pending_queue(data)
+        if not queue:
+            return []
+        
+        result = []
+        for d in queue:
+            result.append((d.product_url, d.pincode))
+            d.notified = True
+        queue.clear()
+        
         save_user_data(user_id, data)
-    
-    return result
+        return result
 
 
 def update_user_last_check(user_id: str) -> None:
-    """Update the last check timestamp for a user."""
-    data = load_user_data(user_id)
-    data["lastCheckedTimestamp"] = datetime.now().isoformat()
-    save_user_data(user_id, data)
+    """Update the last check timestamp (unix epoch seconds) for a user."""
+    with _get_lock(user_id):
+        data = load_user_data(user_id)
+        data["lastCheckedTimestamp"] = time.time()
+        save_user_data(user_id, data)
 
 
 def get_user_stats(user_id: str) -> Dict[str, Any]:
     """Get statistics for a user."""
     data = load_user_data(user_id)
-    deliveries = data.get("deliveries", [])
-    seen = data.get("seenProducts", [])
-    pincodes = data.get("pincodes", [])
-    
-    pending = sum(1 for d in deliveries if not d.get("notified", False))
     
     return {
-        "seen_products": len(seen),
-        "total_deliveries": len(deliveries),
-        "pending_notifications": pending,
-        "pincode_count": len(pincodes)
+        "seen_products": count_seen_products(user_id),
+        "total_deliveries": len(data.get("deliveries", ())),
+        "pending_notifications": len(_pending_queue(data)),
+        "pincode_count": len(data.get("pincodes", ()))
     }
 
 
-def cleanup_user_old_entries(user_id: str, max_seen: int = 500) -> int:
-    """Cleanup old entries to prevent file bloat."""
-    data = load_user_data(user_id)
-    seen = data.get("seenProducts", [])
-    
-    if len(seen) > max_seen:
-        data["seenProducts"] = seen[-max_seen:]
-        save_user_data(user_id, data)
-        return len(seen) - max_seen
-    
-    return 0
+def cleanup_user_old_entries(user_id: str, max_seen: int = MAX_SEEN_PRODUCTS) -> int:
+    """
+    Keep only the newest max_seen seen products for a user. Returns how many were removed.
+    Inserts already trim to MAX_SEEN_PRODUCTS, so this is only needed for a smaller cap.
+    """
+    with _SEEN_LOCK:
+        conn = _get_seen_conn()
+        removed = _delete_oldest_seen(conn, user_id, max_seen)
+        conn.commit()
+        _SEEN_COUNTS.pop(user_id, None)
+        conn.execute("PRAGMA optimize")
+    return removed